@@ -1,47 +1,270 @@
-from groq import Groq
-
-from secret import GROQ_API_KEY
+from ai_backends import GroqBackend
+from ai_memory import MemoryStore, format_turn, estimate_tokens
+from ai_cache import ResponseCache
+from ai_limits import TokenBucket, retry_with_backoff
 
+import asyncio
+import os
+import queue
+import threading
 import time
 
+# Nothing below touches the disk or the network at import time: the prompt,
+# memory, cache and client are created on first use (or by warm_up)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL = "llama3-70b-8192"
+MAX_CONCURRENT_REQUESTS = 8
+
+you_are = None
+backend = None
+memory_store = None
+response_cache = None
+init_lock = threading.RLock()
+
+def get_you_are():
+    global you_are
+    with init_lock:
+        if you_are is None:
+            with open(os.path.join(BASE_DIR, "you_are.txt"), "r") as f1:
+                you_are = f1.read()
+    return you_are
+
+def get_backend():
+    global backend
+    with init_lock:
+        if backend is None:
+            from secret import GROQ_API_KEY
+            backend = GroqBackend(GROQ_API_KEY, MODEL, max_connections=MAX_CONCURRENT_REQUESTS)
+    return backend
 
-client = Groq(
-    api_key=GROQ_API_KEY,
-)
+def set_backend(new_backend):
+    # Swap the provider, e.g. for the fake server in ai_benchmark.py
+    global backend
+    backend = new_backend
 
-with open("you_are.txt", "r") as f1:
-    you_are = f1.read()
+def get_memory_store():
+    global memory_store
+    with init_lock:
+        if memory_store is None:
+            memory_store = MemoryStore(os.path.join(BASE_DIR, "memory.peepee_poopoo"), summarizer=summarize_memory)
+    return memory_store
 
-def send_to_AI(message):
-        
-    with open ("memory.peepee_poopoo", "r+") as mem:
-        memory = mem.read()
+def get_response_cache():
+    global response_cache
+    with init_lock:
+        if response_cache is None:
+            response_cache = ResponseCache(os.path.join(BASE_DIR, "ai_cache.json"))
+    return response_cache
 
-        chat_completion = client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": str(you_are) + "It is: " + str(time.time()) + 
-             ".   this is what you remember from our previous conversation: " + str(memory)},
+def summarize_memory(summary, turns):
+    # Folds old exchanges into the rolling summary; runs on the memory's background thread
+    transcript = "".join(format_turn(user_message, reply) for user_message, reply in turns)
 
-            {"role": "user", "content": message}
+    return get_backend().complete(
+        [
+            {"role": "system", "content": "Update the summary of your previous conversations with the user. "
+             "Keep facts about the user, their situation and anything you promised. Answer with the summary only."},
+
+            {"role": "user", "content": "Summary so far: " + summary + "\nNew conversation: " + transcript}
         ],
-        model="llama3-70b-8192",
-        stream=False,
+        temperature=0.3,
+    )
+
+TEMPERATURE = 1.5  # used when a caller passes no temperature
+# Callers that explicitly ask for a hotter reply than this want variety and bypass the cache
+CACHE_MAX_TEMPERATURE = 0.7
+
+REQUESTS_PER_MINUTE = 30  # provider quota for MODEL
+TOKENS_PER_MINUTE = 6000
+EXPECTED_REPLY_TOKENS = 300  # reserved per request on top of the prompt
+
+request_bucket = TokenBucket.per_minute(REQUESTS_PER_MINUTE)
+token_bucket = TokenBucket.per_minute(TOKENS_PER_MINUTE)
+
+def reply_options(temperature):
+    return dict(
         top_p=1,
-        temperature=1.5,
+        temperature=TEMPERATURE if temperature is None else temperature,
         frequency_penalty=2.0,
         presence_penalty=2.0,
     )
 
-    output = chat_completion.choices[0].message.content
+def build_messages(message):
+    # Summary + recent exchanges + the most relevant older ones, within a fixed budget
+    memory = get_memory_store().build_context(message)
+
+    return [
+        {"role": "system", "content": str(get_you_are()) + "It is: " + str(time.time()) + 
+         ".   this is what you remember from our previous conversation: " + str(memory)},
+
+        {"role": "user", "content": message}
+    ]
+
+def lookup_cache(message, temperature, fresh):
+    # Repeated questions ("hi", "how are you") are answered from the cache.
+    # Used by send_to_AI, stream_to_AI and their async/background variants with
+    # their defaults; bypassed only on request: fresh=True, or an explicit
+    # temperature above CACHE_MAX_TEMPERATURE.
+    # Returns (cache key digest or None when bypassed, cached reply or None)
+    if fresh or (temperature is not None and temperature > CACHE_MAX_TEMPERATURE):
+        return None, None
+    memory_digest = get_memory_store().digest()
+    cached = get_response_cache().get(message, memory_digest)
+    if cached is not None:
+        get_memory_store().add_turn(message, cached)
+    return memory_digest, cached
+
+def remember(message, output, memory_digest):
+    get_memory_store().add_turn(message, output)
+    if memory_digest is not None:
+        get_response_cache().put(message, memory_digest, output)
+
+def send_to_AI(message, temperature=None, fresh=False):
+
+    memory_digest, cached = lookup_cache(message, temperature, fresh)
+    if cached is not None:
+        return cached
+
+    output = get_backend().complete(build_messages(message), **reply_options(temperature))
 
     print("\n", output)
     # pyttsx3_TTS(output)
 
-    with open("memory.peepee_poopoo", "a") as mem:
-        mem.write("\nUser: " + message  + "\nYou: " + output)
+    remember(message, output, memory_digest)
+
+    return output
+
+def stream_to_AI(message, temperature=None, fresh=False):
+    # Like send_to_AI, but yields the reply piece by piece as it arrives;
+    # the full reply is remembered (and cached) once the stream is done
+
+    memory_digest, cached = lookup_cache(message, temperature, fresh)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    for token in get_backend().stream(build_messages(message), **reply_options(temperature)):
+        parts.append(token)
+        yield token
+
+    remember(message, "".join(parts), memory_digest)
+
+# Async variants: one shared connection pool, a concurrency limit, the provider's
+# quotas as token buckets and jittered-backoff retries, so many rooms can ask at once
+
+async_state = None  # (event loop, semaphore) of the loop in use
+
+def request_slots():
+    # The semaphore belongs to one event loop (as does the backend's pool); make a new one for a new loop
+    global async_state
+    loop = asyncio.get_running_loop()
+    if async_state is None or async_state[0] is not loop:
+        async_state = (loop, asyncio.Semaphore(MAX_CONCURRENT_REQUESTS))
+    return async_state[1]
+
+def retry_after(error):
+    # Delay the provider asked for in a 429/503 response, if any
+    try:
+        return float(error.response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+async def call_with_limits(call, messages):
+    async def attempt():
+        # Every attempt, retries included, counts against the quotas
+        await request_bucket.acquire()
+        await token_bucket.acquire(sum(estimate_tokens(m["content"]) for m in messages) + EXPECTED_REPLY_TOKENS)
+        return await call()
+
+    return await retry_with_backoff(attempt, get_backend().is_retryable, retry_after=retry_after)
+
+async def send_to_AI_async(message, temperature=None, fresh=False):
+
+    memory_digest, cached = lookup_cache(message, temperature, fresh)
+    if cached is not None:
+        return cached
+
+    messages = build_messages(message)
+    async with request_slots():
+        output = await call_with_limits(lambda: get_backend().complete_async(messages, **reply_options(temperature)),
+                                        messages)
+
+    remember(message, output, memory_digest)
 
     return output
 
+async def stream_to_AI_async(message, temperature=None, fresh=False):
+
+    memory_digest, cached = lookup_cache(message, temperature, fresh)
+    if cached is not None:
+        yield cached
+        return
+
+    messages = build_messages(message)
+    parts = []
+    async with request_slots():
+        stream = await call_with_limits(lambda: get_backend().open_stream_async(messages, **reply_options(temperature)),
+                                        messages)
+        async for token in stream:
+            parts.append(token)
+            yield token
+
+    remember(message, "".join(parts), memory_digest)
+
+# Background event loop so threads that must not block (the Tk loop) can use the async variants
+
+background_loop = None
+background_lock = threading.Lock()
+
+def get_background_loop():
+    global background_loop
+    with background_lock:
+        if background_loop is None:
+            background_loop = asyncio.new_event_loop()
+            threading.Thread(target=background_loop.run_forever, daemon=True).start()
+    return background_loop
+
+def warm_up():
+    # Called by the chat app once its window is up: loads the prompt, memory and
+    # cache and opens the provider connection on the background loop, off the UI thread
+    def run():
+        try:
+            get_you_are()
+            get_memory_store()
+            get_response_cache()
+            asyncio.run_coroutine_threadsafe(get_backend().warm_up_async(), get_background_loop()).result()
+        except Exception as e:
+            print(f"AI warm-up failed: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+def submit_to_AI(message, temperature=None, fresh=False):
+    # Returns a concurrent.futures.Future with the reply; never blocks the caller
+    return asyncio.run_coroutine_threadsafe(send_to_AI_async(message, temperature, fresh), get_background_loop())
+
+def stream_in_background(message, temperature=None, fresh=False):
+    # Synchronous view of stream_to_AI_async running on the background loop:
+    # the calling (worker) thread only waits on a queue, all requests share one pool
+    pieces = queue.Queue()
+
+    async def pump():
+        try:
+            async for piece in stream_to_AI_async(message, temperature, fresh):
+                pieces.put(piece)
+        finally:
+            pieces.put(None)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_background_loop())
+    while True:
+        piece = pieces.get()
+        if piece is None:
+            break
+        yield piece
+    future.result()  # re-raise a failed stream
+
 if __name__ == "__main__":
     userIn = "-1"
     while userIn != "exit":
@@ -1,15 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-from typing import Dict, List, Optional, Union, Callable
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple, Union, Callable
 from datetime import datetime
 import os
+import queue
+import threading
 from PIL import Image, ImageTk
 from chat_manager import ChatManager, ChatRoom
+from events import room_topic, dm_topic
+from location_directory import location_key
 from user import User, UserType
 from soldier import Soldier, CombatRole
 from evacuee import Evacuee
 from psychologist import Psychologist
 
+PAGE_SIZE = 50  # messages fetched per history page
+MAX_RENDERED_MESSAGES = 200  # messages kept in the display at once
+POLL_INTERVAL = 50  # ms between checks for AI reply pieces while a reply streams
+
 class ChatInterface:
     """Class representing the chat interface"""
     
@@ -17,7 +25,8 @@ class ChatInterface:
                  root: tk.Tk,
                  chat_manager: ChatManager,
                  current_user: User,
-                 on_logout: Callable[[], None]):
+                 on_logout: Callable[[], None],
+                 assistant: Optional[Callable[[str], Iterator[str]]] = None):
         """
         Initialize the chat interface
         
@@ -26,11 +35,13 @@ class ChatInterface:
             chat_manager: ChatManager instance
             current_user: Currently logged in user
             on_logout: Callback function for logout
+            assistant: Optional function streaming the AI's reply to a question
         """
         self.root = root
         self.chat_manager = chat_manager
         self.current_user = current_user
         self.on_logout = on_logout
+        self.assistant = assistant
         
         # Configure styles
         self.configure_styles()
@@ -51,7 +62,23 @@ class ChatInterface:
         # Initialize state
         self.current_room: Optional[ChatRoom] = None
         self.current_dm_user: Optional[User] = None
-        self.message_update_job: Optional[str] = None
+        self.message_update_job: Optional[str] = None  # pending after_idle drain of event_queue
+        self.unsubscribe_events: Optional[Callable[[], None]] = None
+        self.event_queue: "queue.Queue[Dict]" = queue.Queue()
+        
+        # Rendering state used to update the display incrementally
+        self.rendered_chat: Optional[tuple] = None  # ("room", room_id, room_filter) or ("dm", user_id)
+        self.room_filter: Optional[Tuple[str, Hashable]] = None  # (sender index, key) the room view is limited to
+        self.rendered_version = 0
+        self.rendered_ids: List[str] = []  # message IDs in display order
+        self.rendered_id_set: set = set()
+        self.rendered_dm_count = 0  # conversation length at the last render
+        self.history_exhausted = False  # nothing older than the first rendered message
+        self.tail_detached = False  # newest messages were trimmed from the window
+        self.scroll_fetch_pending = False
+        
+        # Streaming AI reply state
+        self.reply_in_flight = False  # one AI reply streams at a time
         
         # Load user's rooms
         self.load_user_rooms()
@@ -143,7 +170,7 @@ class ChatInterface:
                                                     width=60,
                                                     height=20)
         self.chat_display.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.config(state=tk.DISABLED, yscrollcommand=self.on_chat_scroll)
         
         # Configure grid weights
         chat_frame.grid_columnconfigure(0, weight=1)
@@ -171,6 +198,14 @@ class ChatInterface:
                                style="Chat.TButton")
         send_button.grid(row=0, column=1, padx=5)
         
+        # Ask AI button
+        if self.assistant:
+            ask_button = ttk.Button(input_frame,
+                                  text="Ask AI",
+                                  command=self.ask_assistant,
+                                  style="Chat.TButton")
+            ask_button.grid(row=0, column=2, padx=5)
+        
         # Configure grid weights
         input_frame.grid_columnconfigure(0, weight=1)
     
@@ -198,9 +233,14 @@ class ChatInterface:
             if room.name == room_name:
                 self.current_room = room
                 self.current_dm_user = None
-                self.update_chat_display()
+                self.apply_room_filter()
+                self.start_message_updates()
                 break
     
+    def apply_room_filter(self) -> None:
+        """Set room_filter for the current room from the interface's filter controls (none by default)"""
+        self.room_filter = None
+    
     def send_message(self) -> None:
         """Send a message in the current chat"""
         content = self.message_var.get().strip()
@@ -209,7 +249,11 @@ class ChatInterface:
         
         if self.current_room:
             # Send to room
-            self.current_room.add_message(self.current_user, content)
+            if self.current_room.add_message(self.current_user, content) is None:
+                wait = self.current_room.slow_mode.retry_after(self.current_user.user_id,
+                                                               self.current_room.settings["slow_mode_interval"])
+                messagebox.showinfo("Slow mode", f"Slow mode is on. You can send again in {wait:.1f} seconds.")
+                return
         elif self.current_dm_user:
             # Send direct message
             self.chat_manager.send_direct_message(self.current_user,
@@ -219,31 +263,345 @@ class ChatInterface:
         self.message_var.set("")
         self.update_chat_display()
     
+    def ask_assistant(self) -> None:
+        """Ask the AI the typed question and stream its reply into the display"""
+        content = self.message_var.get().strip()
+        if not content or self.reply_in_flight:
+            return
+        self.message_var.set("")
+        
+        # The reply is private to this user: it is rendered, not posted
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.insert("end-1c", "You (to AI):\n", "sender")
+        self.chat_display.insert("end-1c", f"{content}\n\n", "message")
+        self.chat_display.insert("end-1c", "AI:\n", "sender")
+        # Left gravity keeps chat messages appended meanwhile after the reply;
+        # the mark is advanced explicitly as reply text is inserted
+        self.chat_display.mark_set("ai_reply", "end-1c")
+        self.chat_display.mark_gravity("ai_reply", tk.LEFT)
+        self.chat_display.config(state=tk.DISABLED)
+        self.chat_display.see(tk.END)
+        
+        # Each reply gets its own queue, so pieces of one can never end up in another
+        reply_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.reply_in_flight = True
+        threading.Thread(target=self.stream_assistant_reply, args=(content, reply_queue), daemon=True).start()
+        self.root.after(POLL_INTERVAL, self.drain_reply_pieces, reply_queue)
+    
+    def stream_assistant_reply(self, question: str, reply_queue: "queue.Queue[Optional[str]]") -> None:
+        """
+        Consume the AI's reply stream on a worker thread and hand pieces to the Tk thread
+        
+        Only the queue is touched here; Tk must not be called from other threads.
+        
+        Args:
+            question: Question sent to the AI
+            reply_queue: Queue of this reply's pieces, closed with None
+        """
+        try:
+            for piece in self.assistant(question):
+                reply_queue.put(piece)
+        except Exception as e:
+            reply_queue.put(f"[AI unavailable: {e}]")
+        reply_queue.put(None)
+    
+    def drain_reply_pieces(self, reply_queue: "queue.Queue[Optional[str]]") -> None:
+        """
+        Render every queued piece of an AI reply at once, polling again until it is complete (Tk thread)
+        
+        Args:
+            reply_queue: Queue of the reply's pieces, closed with None
+        """
+        pieces = []
+        done = False
+        while True:
+            try:
+                piece = reply_queue.get_nowait()
+            except queue.Empty:
+                break
+            if piece is None:
+                done = True
+            else:
+                pieces.append(piece)
+        if done:
+            self.reply_in_flight = False
+        else:
+            self.root.after(POLL_INTERVAL, self.drain_reply_pieces, reply_queue)
+        
+        # The reply is dropped from view if the chat was redrawn meanwhile
+        if "ai_reply" not in self.chat_display.mark_names():
+            return
+        at_bottom = self.chat_display.yview()[1] >= 1.0
+        self.chat_display.config(state=tk.NORMAL)
+        text = "".join(pieces) + ("\n\n" if done else "")
+        if text:
+            self.chat_display.insert("ai_reply", text, "message")
+            self.chat_display.mark_set("ai_reply", f"ai_reply + {len(text)} chars")
+        if done:
+            self.chat_display.mark_unset("ai_reply")
+        self.chat_display.config(state=tk.DISABLED)
+        if at_bottom:
+            self.chat_display.see(tk.END)
+    
     def update_chat_display(self) -> None:
-        """Update the chat display with current messages"""
+        """Bring the chat display up to date, touching only what changed"""
+        if self.current_room:
+            chat_key = ("room", self.current_room.room_id, self.room_filter)
+        elif self.current_dm_user:
+            chat_key = ("dm", self.current_dm_user.user_id)
+        else:
+            chat_key = None
+        
+        if chat_key != self.rendered_chat:
+            self.redraw_chat_display(chat_key)
+            return
+        
+        if self.current_room:
+            room = self.current_room
+            if room.version == self.rendered_version:
+                return
+            changed_ids = room.changes_since(self.rendered_version)
+            if changed_ids is None:
+                self.redraw_chat_display(chat_key)
+                return
+            
+            self.chat_display.config(state=tk.NORMAL)
+            for message_id in changed_ids:
+                if message_id in self.rendered_id_set:
+                    self.patch_message(message_id, room._get_message(message_id))
+            self.rendered_version = room.version
+            
+            if self.tail_detached:
+                self.chat_display.config(state=tk.DISABLED)
+                return
+            last_id = self.rendered_ids[-1] if self.rendered_ids else None
+            new_messages = self.room_messages_after(last_id, PAGE_SIZE + 1)
+            if new_messages is None or len(new_messages) > PAGE_SIZE:
+                self.chat_display.config(state=tk.DISABLED)
+                self.redraw_chat_display(chat_key)
+                return
+            self.append_messages(new_messages)
+            self.trim_rendered_top()
+        elif self.current_dm_user:
+            messages = self.chat_manager.get_direct_messages(self.current_user,
+                                                          self.current_dm_user)
+            new_count = len(messages) - self.rendered_dm_count
+            if new_count <= 0:
+                return
+            self.rendered_dm_count = len(messages)
+            if self.tail_detached:
+                return
+            if new_count > PAGE_SIZE:
+                self.redraw_chat_display(chat_key)
+                return
+            self.chat_display.config(state=tk.NORMAL)
+            self.append_messages(messages[-new_count:])
+            self.trim_rendered_top()
+    
+    def redraw_chat_display(self, chat_key: Optional[tuple]) -> None:
+        """
+        Clear the display and render the newest page of the current chat
+        
+        Args:
+            chat_key: Identifier of the chat being rendered
+        """
         self.chat_display.config(state=tk.NORMAL)
         self.chat_display.delete(1.0, tk.END)
+        for mark in self.chat_display.mark_names():
+            if mark.startswith("msg_") or mark == "ai_reply":
+                self.chat_display.mark_unset(mark)
+        self.rendered_ids = []
+        self.rendered_id_set = set()
+        self.rendered_chat = chat_key
+        self.tail_detached = False
         
         if self.current_room:
             # Display room messages
-            for message in self.current_room.messages:
-                self.display_message(message)
+            self.rendered_version = self.current_room.version
+            page = self.room_page()
         elif self.current_dm_user:
             # Display direct messages
             messages = self.chat_manager.get_direct_messages(self.current_user,
                                                           self.current_dm_user)
-            for message in messages:
-                self.display_message(message)
+            self.rendered_dm_count = len(messages)
+            page = messages[-PAGE_SIZE:]
+        else:
+            page = []
+        
+        self.history_exhausted = len(page) < PAGE_SIZE
+        self.append_messages(page)
+    
+    def fetch_page(self,
+                   before: Optional[str] = None,
+                   after: Optional[str] = None) -> Optional[List[Dict[str, Union[str, datetime, Dict]]]]:
+        """
+        Fetch a page of the current chat's history around the rendered window
+        
+        Args:
+            before: Fetch messages older than this message ID
+            after: Fetch messages newer than this message ID
+            
+        Returns:
+            Up to PAGE_SIZE messages in chronological order, or None if the
+            anchor message no longer exists
+        """
+        if self.current_room:
+            if after is not None:
+                return self.room_messages_after(after, PAGE_SIZE)
+            return self.room_page(before)
+        if self.current_dm_user:
+            return self.chat_manager.get_direct_messages(self.current_user,
+                                                      self.current_dm_user,
+                                                      limit=PAGE_SIZE,
+                                                      before=before,
+                                                      after=after)
+        return []
+    
+    def room_page(self, before: Optional[str] = None) -> List[Dict[str, Union[str, datetime, Dict]]]:
+        """
+        Get a page of the current room's history, limited to room_filter if set
+        
+        Args:
+            before: Optional ID of a message; only older messages are returned
+            
+        Returns:
+            Up to PAGE_SIZE messages in chronological order
+        """
+        if self.room_filter:
+            return self.current_room.get_indexed_messages(*self.room_filter, before=before, limit=PAGE_SIZE)
+        return self.current_room.get_messages(before=before, limit=PAGE_SIZE)
+    
+    def room_messages_after(self,
+                            message_id: Optional[str],
+                            limit: int) -> Optional[List[Dict[str, Union[str, datetime, Dict]]]]:
+        """
+        Get the current room's messages after a given one, limited to room_filter if set
+        
+        Args:
+            message_id: ID of the last message the caller has, or None to start from the beginning
+            limit: Maximum number of messages to return
+            
+        Returns:
+            Newer messages in chronological order, or None if the given message no longer exists
+        """
+        if self.room_filter:
+            return self.current_room.indexed_messages_after(*self.room_filter, message_id, limit)
+        return self.current_room.messages_after(message_id, limit)
+    
+    def on_chat_scroll(self, first: str, last: str) -> None:
+        """
+        Track the scrollbar and fetch neighbouring pages at either edge of the window
+        
+        Args:
+            first: Fraction of the content above the view
+            last: Fraction of the content up to the bottom of the view
+        """
+        self.chat_display.vbar.set(first, last)
+        if self.scroll_fetch_pending or not self.rendered_ids:
+            return
+        if float(first) <= 0.0 and not self.history_exhausted:
+            self.scroll_fetch_pending = True
+            self.root.after_idle(self.load_older_messages)
+        elif float(last) >= 1.0 and self.tail_detached:
+            self.scroll_fetch_pending = True
+            self.root.after_idle(self.load_newer_messages)
+    
+    def load_older_messages(self) -> None:
+        """Prepend the page before the first rendered message"""
+        self.scroll_fetch_pending = False
+        if not self.rendered_ids:
+            return
+        first_id = self.rendered_ids[0]
+        older = self.fetch_page(before=first_id) or []
+        if len(older) < PAGE_SIZE:
+            self.history_exhausted = True
+        if not older:
+            return
         
+        self.chat_display.config(state=tk.NORMAL)
+        for message in reversed(older):
+            self.insert_message("1.0", message)
+        older_ids = [message["message_id"] for message in older]
+        self.rendered_ids[:0] = older_ids
+        self.rendered_id_set.update(older_ids)
+        self.trim_rendered_bottom()
         self.chat_display.config(state=tk.DISABLED)
-        self.chat_display.see(tk.END)
+        
+        # Keep the message the user was looking at in place
+        self.chat_display.yview(f"msg_{first_id}")
     
-    def display_message(self, message: Dict[str, Union[str, datetime, Dict]]) -> None:
+    def load_newer_messages(self) -> None:
+        """Append the page after the last rendered message when the tail was trimmed"""
+        self.scroll_fetch_pending = False
+        if not self.rendered_ids:
+            return
+        newer = self.fetch_page(after=self.rendered_ids[-1])
+        if newer is None:
+            self.redraw_chat_display(self.rendered_chat)
+            return
+        if len(newer) < PAGE_SIZE:
+            self.tail_detached = False
+        
+        self.chat_display.config(state=tk.NORMAL)
+        for message in newer:
+            self.display_message(message)
+        self.trim_rendered_top()
+        self.chat_display.config(state=tk.DISABLED)
+    
+    def trim_rendered_top(self) -> None:
+        """Drop the oldest rendered messages beyond the window size"""
+        excess = len(self.rendered_ids) - MAX_RENDERED_MESSAGES
+        if excess <= 0:
+            return
+        self.chat_display.config(state=tk.NORMAL)
+        self.chat_display.delete("1.0", f"msg_{self.rendered_ids[excess]}")
+        self.forget_rendered(self.rendered_ids[:excess])
+        del self.rendered_ids[:excess]
+        self.history_exhausted = False
+        self.chat_display.config(state=tk.DISABLED)
+    
+    def trim_rendered_bottom(self) -> None:
+        """Drop the newest rendered messages beyond the window size (display must be writable)"""
+        if len(self.rendered_ids) <= MAX_RENDERED_MESSAGES:
+            return
+        self.chat_display.delete(f"msg_{self.rendered_ids[MAX_RENDERED_MESSAGES]}", "end-1c")
+        self.forget_rendered(self.rendered_ids[MAX_RENDERED_MESSAGES:])
+        del self.rendered_ids[MAX_RENDERED_MESSAGES:]
+        self.tail_detached = True
+    
+    def forget_rendered(self, message_ids: List[str]) -> None:
         """
-        Display a single message in the chat
+        Remove the marks and bookkeeping of messages that left the display
         
         Args:
-            message: Message to display
+            message_ids: IDs of the removed messages
+        """
+        for message_id in message_ids:
+            self.chat_display.mark_unset(f"msg_{message_id}", f"msg_{message_id}_end")
+            self.rendered_id_set.discard(message_id)
+    
+    def append_messages(self, messages: List[Dict[str, Union[str, datetime, Dict]]]) -> None:
+        """
+        Append messages to the end of the (writable) display and lock it again
+        
+        Args:
+            messages: Messages to append in chronological order
+        """
+        for message in messages:
+            self.display_message(message)
+        self.chat_display.config(state=tk.DISABLED)
+        if messages:
+            self.chat_display.see(tk.END)
+    
+    def format_message(self, message: Dict[str, Union[str, datetime, Dict]]) -> List[tuple]:
+        """
+        Format a message as (text, tag) chunks for the display
+        
+        Args:
+            message: Message to format
+            
+        Returns:
+            List of (text, tag) pairs
         """
         # Format timestamp
         timestamp = message["timestamp"]
@@ -256,21 +614,107 @@ class ChatInterface:
         if message["sender_id"] == self.current_user.user_id:
             sender_name = "You"
         
-        # Add message to display
-        self.chat_display.insert(tk.END, f"{sender_name} ({time_str}):\n", "sender")
-        self.chat_display.insert(tk.END, f"{message['content']}\n\n", "message")
+        return [(f"{sender_name} ({time_str}):\n", "sender"),
+                (f"{message['content']}\n\n", "message")]
+    
+    def insert_message(self, index: str, message: Dict[str, Union[str, datetime, Dict]]) -> None:
+        """
+        Insert a formatted message at an index and bracket it with marks
+        
+        Args:
+            index: Text index to insert at
+            message: Message to insert
+        """
+        start = self.chat_display.index(index)
+        length = 0
+        for text, tag in self.format_message(message):
+            self.chat_display.insert(f"{start} + {length} chars", text, tag)
+            length += len(text)
+        
+        # Start marks move right and end marks stay left, so text inserted at a
+        # boundary between two messages never ends up inside the neighbour's range
+        message_id = message["message_id"]
+        self.chat_display.mark_set(f"msg_{message_id}", start)
+        self.chat_display.mark_set(f"msg_{message_id}_end", f"{start} + {length} chars")
+        self.chat_display.mark_gravity(f"msg_{message_id}", tk.RIGHT)
+        self.chat_display.mark_gravity(f"msg_{message_id}_end", tk.LEFT)
+    
+    def patch_message(self,
+                      message_id: str,
+                      message: Optional[Dict[str, Union[str, datetime, Dict]]]) -> None:
+        """
+        Re-render an edited message in place, or remove a deleted one
+        
+        Args:
+            message_id: ID of the rendered message
+            message: Current message, or None if it was deleted
+        """
+        start, end = f"msg_{message_id}", f"msg_{message_id}_end"
+        self.chat_display.delete(start, end)
+        if message:
+            self.insert_message(start, message)
+            return
+        self.chat_display.mark_unset(start, end)
+        self.rendered_ids.remove(message_id)
+        self.rendered_id_set.discard(message_id)
+    
+    def display_message(self, message: Dict[str, Union[str, datetime, Dict]]) -> None:
+        """
+        Display a single message at the end of the chat
+        
+        Args:
+            message: Message to display
+        """
+        self.insert_message("end-1c", message)
+        self.rendered_ids.append(message["message_id"])
+        self.rendered_id_set.add(message["message_id"])
     
     def start_message_updates(self) -> None:
-        """Start periodic message updates"""
+        """Subscribe to the current chat's events and bring the display up to date"""
+        self.stop_message_updates()
+        if self.current_room:
+            topic = room_topic(self.current_room.room_id)
+        elif self.current_dm_user:
+            topic = dm_topic(self.current_user.user_id, self.current_dm_user.user_id)
+        else:
+            topic = None
+        if topic is not None:
+            self.unsubscribe_events = self.chat_manager.bus.subscribe(topic, self.on_chat_event)
         self.update_chat_display()
-        self.message_update_job = self.root.after(5000, self.start_message_updates)
     
     def stop_message_updates(self) -> None:
-        """Stop periodic message updates"""
+        """Unsubscribe from chat events and cancel a pending redraw"""
+        if self.unsubscribe_events:
+            self.unsubscribe_events()
+            self.unsubscribe_events = None
         if self.message_update_job:
             self.root.after_cancel(self.message_update_job)
             self.message_update_job = None
     
+    def on_chat_event(self, event: Dict) -> None:
+        """
+        Queue a chat event, scheduling one drain for the events that arrive before it runs
+        
+        Chat events are published on the Tk thread (every mutation comes
+        from the UI), so scheduling here is safe.
+        
+        Args:
+            event: Published event
+        """
+        self.event_queue.put(event)
+        if self.message_update_job is None:
+            self.message_update_job = self.root.after_idle(self.drain_chat_events)
+    
+    def drain_chat_events(self) -> None:
+        """Consume queued events and apply them with a single incremental update"""
+        self.message_update_job = None
+        while True:
+            try:
+                self.event_queue.get_nowait()
+            except queue.Empty:
+                break
+        self.update_chat_display()
+    
     def show(self) -> None:
         """Show the chat interface"""
         self.main_frame.grid()
@@ -288,7 +732,8 @@ class SoldierChatInterface(ChatInterface):
                  root: tk.Tk,
                  chat_manager: ChatManager,
                  soldier: Soldier,
-                 on_logout: Callable[[], None]):
+                 on_logout: Callable[[], None],
+                 assistant: Optional[Callable[[str], Iterator[str]]] = None):
         """
         Initialize the soldier chat interface
         
@@ -297,8 +742,10 @@ class SoldierChatInterface(ChatInterface):
             chat_manager: ChatManager instance
             soldier: Currently logged in soldier
             on_logout: Callback function for logout
+            assistant: Optional function streaming the AI's reply to a question
         """
-        super().__init__(root, chat_manager, soldier, on_logout)
+        self.role_filter: Optional[ttk.Combobox] = None  # created after the base interface
+        super().__init__(root, chat_manager, soldier, on_logout, assistant)
         self.setup_soldier_specific_controls()
     
     def setup_soldier_specific_controls(self) -> None:
@@ -312,7 +759,7 @@ class SoldierChatInterface(ChatInterface):
                  style="Message.TLabel").grid(row=0, column=0, padx=5)
         
         self.role_filter = ttk.Combobox(filter_frame,
-                                      values=[role.value for role in CombatRole],
+                                      values=["All Roles"] + [role.value for role in CombatRole],
                                       state="readonly",
                                       width=20)
         self.role_filter.grid(row=0, column=1, padx=5)
@@ -326,11 +773,18 @@ class SoldierChatInterface(ChatInterface):
         Args:
             event: Optional event that triggered the filter
         """
-        selected_role = self.role_filter.get()
-        if selected_role != "All Roles":
-            # TODO: Implement role-based filtering
-            pass
+        # The display redraws from the room's role index since the chat key changed
+        self.apply_room_filter()
         self.update_chat_display()
+    
+    def apply_room_filter(self) -> None:
+        """Limit the room view to the selected combat role"""
+        selected_role = self.role_filter.get() if self.role_filter else "All Roles"
+        if selected_role == "All Roles" or not self.current_room:
+            self.room_filter = None
+        else:
+            self.chat_manager.index_room_by_combat_role(self.current_room)
+            self.room_filter = ("combat_role", CombatRole(selected_role))
 
 class EvacueeChatInterface(ChatInterface):
     """Class representing the evacuee-specific chat interface"""
@@ -339,7 +793,8 @@ class EvacueeChatInterface(ChatInterface):
                  root: tk.Tk,
                  chat_manager: ChatManager,
                  evacuee: Evacuee,
-                 on_logout: Callable[[], None]):
+                 on_logout: Callable[[], None],
+                 assistant: Optional[Callable[[str], Iterator[str]]] = None):
         """
         Initialize the evacuee chat interface
         
@@ -348,8 +803,10 @@ class EvacueeChatInterface(ChatInterface):
             chat_manager: ChatManager instance
             evacuee: Currently logged in evacuee
             on_logout: Callback function for logout
+            assistant: Optional function streaming the AI's reply to a question
         """
-        super().__init__(root, chat_manager, evacuee, on_logout)
+        self.location_filter: Optional[ttk.Combobox] = None  # created after the base interface
+        super().__init__(root, chat_manager, evacuee, on_logout, assistant)
         self.setup_evacuee_specific_controls()
     
     def setup_evacuee_specific_controls(self) -> None:
@@ -364,10 +821,21 @@ class EvacueeChatInterface(ChatInterface):
         
         self.location_filter = ttk.Combobox(filter_frame,
                                           state="readonly",
-                                          width=20)
+                                          width=20,
+                                          postcommand=self.refresh_locations)
         self.location_filter.grid(row=0, column=1, padx=5)
         self.location_filter.set("All Locations")
         self.location_filter.bind('<<ComboboxSelected>>', self.filter_by_location)
+        self.refresh_locations()
+        
+        ttk.Button(filter_frame,
+                  text="Who else is from my town?",
+                  command=self.show_neighbours,
+                  style="Chat.TButton").grid(row=0, column=2, padx=5)
+    
+    def refresh_locations(self) -> None:
+        """Fill the location filter from the directory (runs whenever the list opens)"""
+        self.location_filter['values'] = ["All Locations"] + self.chat_manager.locations.locations()
     
     def filter_by_location(self, event: Optional[tk.Event]) -> None:
         """
@@ -376,11 +844,28 @@ class EvacueeChatInterface(ChatInterface):
         Args:
             event: Optional event that triggered the filter
         """
-        selected_location = self.location_filter.get()
-        if selected_location != "All Locations":
-            # TODO: Implement location-based filtering
-            pass
+        # The display redraws from the room's location index since the chat key changed
+        self.apply_room_filter()
         self.update_chat_display()
+    
+    def apply_room_filter(self) -> None:
+        """Limit the room view to evacuees from or to the selected location"""
+        selected_location = self.location_filter.get() if self.location_filter else "All Locations"
+        if selected_location == "All Locations" or not self.current_room:
+            self.room_filter = None
+        else:
+            self.chat_manager.index_room_by_location(self.current_room)
+            self.room_filter = ("location", location_key(selected_location))
+    
+    def show_neighbours(self) -> None:
+        """Show the other evacuees who evacuated from the user's town"""
+        neighbours = self.chat_manager.locations.neighbours(self.current_user.user_id)
+        town = self.current_user.evacuated_from
+        if not neighbours:
+            messagebox.showinfo("Your town", f"No one else from {town} is registered yet.")
+            return
+        names = "\n".join(name for _, name in neighbours)
+        messagebox.showinfo("Your town", f"Also evacuated from {town}:\n\n{names}")
 
 class PsychologistChatInterface(ChatInterface):
     """Class representing the psychologist-specific chat interface"""
@@ -389,7 +874,8 @@ class PsychologistChatInterface(ChatInterface):
                  root: tk.Tk,
                  chat_manager: ChatManager,
                  psychologist: Psychologist,
-                 on_logout: Callable[[], None]):
+                 on_logout: Callable[[], None],
+                 assistant: Optional[Callable[[str], Iterator[str]]] = None):
         """
         Initialize the psychologist chat interface
         
@@ -398,8 +884,9 @@ class PsychologistChatInterface(ChatInterface):
             chat_manager: ChatManager instance
             psychologist: Currently logged in psychologist
             on_logout: Callback function for logout
+            assistant: Optional function streaming the AI's reply to a question
         """
-        super().__init__(root, chat_manager, psychologist, on_logout)
+        super().__init__(root, chat_manager, psychologist, on_logout, assistant)
         self.setup_psychologist_specific_controls()
     
     def setup_psychologist_specific_controls(self) -> None:
@@ -0,0 +1,184 @@
+from typing import Any, Dict, Iterator
+from datetime import datetime
+import json
+import os
+import threading
+
+DEFAULT_BATCH_SIZE = 64  # records per forced fsync
+DEFAULT_SYNC_INTERVAL = 0.05  # seconds a record may wait for its group commit
+
+def json_default(value: Any) -> Any:
+    """
+    Serialize values the json module does not handle natively
+
+    Args:
+        value: Value to serialize
+
+    Returns:
+        JSON-compatible representation of the value
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, set):
+        return list(value)
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class ChatLog:
+    """Append-only operation log with group commit"""
+
+    def __init__(self,
+                 path: str,
+                 start_seq: int = 0,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 sync_interval: float = DEFAULT_SYNC_INTERVAL):
+        """
+        Open (or create) an operation log
+
+        Records are written immediately but fsynced in groups: either once
+        batch_size records are pending or sync_interval seconds after the
+        first pending record, whichever comes first.
+
+        Args:
+            path: Path of the log file
+            start_seq: Sequence number already covered by the latest snapshot
+            batch_size: Number of pending records that forces an fsync
+            sync_interval: Maximum delay before pending records are fsynced
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.seq = start_seq
+        self._pending = 0
+        self._closed = False
+        self._lock = threading.Condition()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._recover()
+        self._file = open(path, 'a', encoding='utf-8')
+
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _recover(self) -> None:
+        """Find the last sequence number and cut off a torn trailing record"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        good_end = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            self.seq = max(self.seq, record.get("seq", 0))
+            good_end += len(line)
+
+        if good_end < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Append a record to the log
+
+        Args:
+            record: JSON-serializable operation record
+
+        Returns:
+            Sequence number assigned to the record
+        """
+        with self._lock:
+            self.seq += 1
+            line = json.dumps({"seq": self.seq, **record}, ensure_ascii=False, default=json_default)
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._sync()
+            elif self._pending == 1:
+                self._lock.notify()
+            return self.seq
+
+    def _sync(self) -> None:
+        """Flush and fsync pending records (caller holds the lock)"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def _flush_loop(self) -> None:
+        """Background group-commit loop"""
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._lock.wait()
+                    continue
+                self._lock.wait(self.sync_interval)
+                if self._pending and not self._closed:
+                    self._sync()
+
+    def flush(self) -> None:
+        """Force all pending records to disk"""
+        with self._lock:
+            if self._pending:
+                self._sync()
+
+    def rotate(self, rotated_path: str) -> None:
+        """
+        Move the current records aside and continue with an empty log
+
+        Appends are only blocked for the duration of a single fsync and
+        rename, so a compaction can fold the rotated file at its own pace.
+
+        Args:
+            rotated_path: Path the current log file is renamed to
+        """
+        with self._lock:
+            self._sync()
+            self._file.close()
+            os.replace(self.path, rotated_path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        """Flush pending records and close the log"""
+        with self._lock:
+            if self._closed:
+                return
+            self._sync()
+            self._closed = True
+            self._file.close()
+            self._lock.notify()
+
+    @staticmethod
+    def read_records(path: str, after_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Read records from a log file
+
+        Args:
+            path: Path of the log file
+            after_seq: Only records with a higher sequence number are returned
+
+        Returns:
+            Iterator over the records in append order
+        """
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("seq", 0) > after_seq:
+                    yield record
@@ -1,13 +1,23 @@
-from typing import List, Dict, Optional, Union, Set
+from typing import Any, Callable, Hashable, Iterable, List, Dict, Optional, Tuple, Union, Set
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-import json
-import os
 import uuid
+from events import ALL_EVENTS, EventBus, room_topic, dm_topic
+from message import RoomMessage, DirectMessage
+from storage import StorageBackend, JsonStorage, conversation_key
+from user_repository import UserRepository
+from search_index import SearchIndex
+from word_filter import MutedWordFilter
+from slow_mode import SlowModeLimiter
+from location_directory import LocationDirectory
 from user import User, UserType
-from soldier import Soldier
+from soldier import Soldier, CombatRole
 from evacuee import Evacuee
 from psychologist import Psychologist
 
+MAX_TRACKED_CHANGES = 1000  # edits/deletions remembered for incremental readers
+MAX_TOMBSTONE_FRACTION = 0.5  # deleted-message slots tolerated before a room's history is compacted
+
 class ChatRoom:
     """Class representing a chat room in the system"""
     
@@ -36,7 +46,15 @@ class ChatRoom:
         self.description = description
         self.is_private = is_private
         self.created_at = datetime.now()
-        self.messages: List[Dict[str, Union[str, datetime, Dict]]] = []
+        self._messages: List[Optional[Dict[str, Union[str, datetime, Dict]]]] = []  # None marks a deleted message
+        self._message_index: Dict[str, int] = {}  # message_id -> position in _messages
+        self._tombstones = 0
+        self._messages_loader: Optional[Callable[[], List[Dict[str, Any]]]] = None  # set by defer_messages
+        self.version = 0  # bumped whenever the visible message list changes
+        self._changes: List[Tuple[int, str]] = []  # (version, message_id) of edits and deletions
+        self._changes_floor = 0  # changes up to this version are no longer tracked
+        self._sender_index_keys: Dict[str, Callable[[str], Iterable[Hashable]]] = {}  # index name -> keys of a sender
+        self._sender_indexes: Dict[str, Dict[Hashable, List[int]]] = {}  # index name -> key -> positions in _messages
         self.participants: Set[str] = {created_by.user_id}
         self.moderators: Set[str] = {created_by.user_id}
         self.pinned_messages: List[str] = []  # List of message IDs
@@ -47,13 +65,310 @@ class ChatRoom:
             "slow_mode_interval": 5,  # seconds
             "muted_words": []
         }
+        self.muted_word_filter: Optional[MutedWordFilter] = None  # compiled from settings["muted_words"]
+        self.slow_mode = SlowModeLimiter()
+        self.journal: Optional[Callable[[Dict[str, Any]], int]] = None  # set by ChatManager
+        self.bus: Optional[EventBus] = None  # set by ChatManager
+    
+    def defer_messages(self, loader: Callable[[], List[Dict[str, Union[str, datetime, Dict]]]]) -> None:
+        """
+        Drop the message history until it is first accessed (see _ensure_loaded)
+        
+        Args:
+            loader: Function returning the serialized messages in chronological order
+        """
+        self._set_messages([])
+        self._messages_loader = loader
+    
+    @property
+    def messages_loaded(self) -> bool:
+        """Whether the message history is in memory"""
+        return self._messages_loader is None
+    
+    def _ensure_loaded(self) -> None:
+        """Load a history deferred by defer_messages; every reader of _messages calls this first"""
+        loader = self._messages_loader
+        if loader is None:
+            return
+        self._messages_loader = None
+        # Nobody has seen the deferred history, so the room version stays as is
+        self._set_messages([RoomMessage.from_dict(message) for message in loader()])
+    
+    @property
+    def messages(self) -> List[Dict[str, Union[str, datetime, Dict]]]:
+        """Live messages in chronological order (a copy; the room's own list keeps tombstones)"""
+        self._ensure_loaded()
+        if not self._tombstones:
+            return list(self._messages)
+        return [message for message in self._messages if message is not None]
+    
+    @messages.setter
+    def messages(self, messages: List[Dict[str, Union[str, datetime, Dict]]]) -> None:
+        self._messages_loader = None
+        self._set_messages([RoomMessage.from_dict(message) for message in messages])
+        # Replacing the history invalidates every incremental reader
+        self.version += 1
+        self._changes.clear()
+        self._changes_floor = self.version
+    
+    def _set_messages(self, messages: List[Dict[str, Union[str, datetime, Dict]]]) -> None:
+        """Install a tombstone-free message list and rebuild the position index"""
+        self._messages = messages
+        self._tombstones = 0
+        self._message_index = {message["message_id"]: i for i, message in enumerate(messages)}
+        for name in self._sender_index_keys:
+            self._build_sender_index(name)
+    
+    def _build_sender_index(self, name: str) -> None:
+        """Rebuild a sender index from the loaded history, resolving each sender once"""
+        keys_of = self._sender_index_keys[name]
+        sender_keys: Dict[str, Iterable[Hashable]] = {}
+        index: Dict[Hashable, List[int]] = {}
+        for position, message in enumerate(self._messages):
+            if message is None:
+                continue
+            sender_id = message["sender_id"]
+            if sender_id not in sender_keys:
+                sender_keys[sender_id] = tuple(keys_of(sender_id))
+            for key in sender_keys[sender_id]:
+                index.setdefault(key, []).append(position)
+        self._sender_indexes[name] = index
+    
+    def index_by_sender(self, name: str, keys_of: Callable[[str], Iterable[Hashable]]) -> None:
+        """
+        Maintain an index from keys derived from the sender (e.g. combat role) to messages
+        
+        Args:
+            name: Name of the index
+            keys_of: Function returning the keys of a sender ID
+        """
+        self._ensure_loaded()
+        self._sender_index_keys[name] = keys_of
+        self._build_sender_index(name)
+    
+    def refresh_sender_index(self, name: str) -> None:
+        """
+        Rebuild a sender index after the keys of some senders changed
+        
+        Args:
+            name: Name of the index (ignored if the room does not maintain it)
+        """
+        if name in self._sender_index_keys:
+            self._build_sender_index(name)
+    
+    def has_sender_index(self, name: str) -> bool:
+        """Whether a sender index is maintained under the given name"""
+        return name in self._sender_index_keys
+    
+    def get_indexed_messages(self,
+                             name: str,
+                             key: Hashable,
+                             before: Optional[str] = None,
+                             limit: int = 50) -> List[Dict[str, Union[str, datetime, Dict]]]:
+        """
+        Get a page of the messages filed under a key of a sender index (see get_messages)
+        
+        Args:
+            name: Name of the index
+            key: Key to filter on
+            before: Optional ID of a message; only older messages are returned
+            limit: Maximum number of messages to return
+            
+        Returns:
+            Up to limit matching messages in chronological order
+        """
+        self._ensure_loaded()
+        positions = self._sender_indexes[name].get(key, [])
+        if before is None:
+            end = len(self._messages)
+        else:
+            end = self._message_index.get(before)
+            if end is None:
+                return []
+        
+        page = []
+        i = bisect_left(positions, end) - 1
+        while i >= 0 and len(page) < limit:
+            message = self._messages[positions[i]]
+            if message is not None:
+                page.append(message)
+            i -= 1
+        page.reverse()
+        return page
+    
+    def indexed_messages_after(self,
+                               name: str,
+                               key: Hashable,
+                               message_id: Optional[str],
+                               limit: Optional[int] = None) -> Optional[List[Dict[str, Union[str, datetime, Dict]]]]:
+        """
+        Get the messages filed under a key of a sender index added after a given message (see messages_after)
+        
+        Args:
+            name: Name of the index
+            key: Key to filter on
+            message_id: ID of the last message the caller has, or None to start from the beginning
+            limit: Optional maximum number of messages to return
+            
+        Returns:
+            Newer matching messages in chronological order, or None if the given message no longer exists
+        """
+        self._ensure_loaded()
+        positions = self._sender_indexes[name].get(key, [])
+        if message_id is None:
+            start = -1
+        else:
+            start = self._message_index.get(message_id)
+            if start is None:
+                return None
+        
+        newer = []
+        for position in positions[bisect_right(positions, start):]:
+            message = self._messages[position]
+            if message is not None:
+                newer.append(message)
+                if limit and len(newer) >= limit:
+                    break
+        return newer
+    
+    def _compact_messages(self) -> None:
+        """Drop deleted-message tombstones and rebuild the position index"""
+        self._set_messages([message for message in self._messages if message is not None])
+    
+    def _touch(self, changed_message_id: Optional[str] = None) -> None:
+        """
+        Bump the room version, remembering which existing message changed
+        
+        Args:
+            changed_message_id: ID of an edited or deleted message
+        """
+        self.version += 1
+        if changed_message_id:
+            self._changes.append((self.version, changed_message_id))
+            if len(self._changes) > MAX_TRACKED_CHANGES:
+                dropped = len(self._changes) // 2
+                self._changes_floor = self._changes[dropped - 1][0]
+                del self._changes[:dropped]
+    
+    def changes_since(self, version: int) -> Optional[List[str]]:
+        """
+        Get the IDs of messages edited or deleted after a given version
+        
+        Args:
+            version: Room version the caller last saw
+            
+        Returns:
+            Changed message IDs (oldest first), or None if the changes are no
+            longer tracked and the caller has to reload everything
+        """
+        if version < self._changes_floor:
+            return None
+        changed = []
+        for change_version, message_id in reversed(self._changes):
+            if change_version <= version:
+                break
+            changed.append(message_id)
+        changed.reverse()
+        return changed
+    
+    def messages_after(self,
+                       message_id: Optional[str],
+                       limit: Optional[int] = None) -> Optional[List[Dict[str, Union[str, datetime, Dict]]]]:
+        """
+        Get the live messages added after a given message
+        
+        Args:
+            message_id: ID of the last message the caller has, or None to start from the beginning
+            limit: Optional maximum number of messages to return
+            
+        Returns:
+            Newer messages in chronological order, or None if the given message no longer exists
+        """
+        self._ensure_loaded()
+        if message_id is None:
+            position = -1
+        else:
+            position = self._message_index.get(message_id)
+            if position is None:
+                return None
+        
+        newer = []
+        for position in range(position + 1, len(self._messages)):
+            message = self._messages[position]
+            if message is not None:
+                newer.append(message)
+                if limit and len(newer) >= limit:
+                    break
+        return newer
+    
+    def get_messages(self,
+                     before: Optional[str] = None,
+                     limit: int = 50) -> List[Dict[str, Union[str, datetime, Dict]]]:
+        """
+        Get a page of message history
+        
+        Args:
+            before: Optional ID of a message; only older messages are returned
+            limit: Maximum number of messages to return
+            
+        Returns:
+            Up to limit messages in chronological order, ending with the
+            newest message (older than before, if given)
+        """
+        self._ensure_loaded()
+        if before is None:
+            end = len(self._messages)
+        else:
+            end = self._message_index.get(before)
+            if end is None:
+                return []
+        
+        page = []
+        position = end - 1
+        while position >= 0 and len(page) < limit:
+            message = self._messages[position]
+            if message is not None:
+                page.append(message)
+            position -= 1
+        page.reverse()
+        return page
+    
+    def _get_message(self, message_id: str) -> Optional[Dict[str, Union[str, datetime, Dict]]]:
+        """
+        Look up a live message by ID in O(1)
+        
+        Args:
+            message_id: ID of message to find
+            
+        Returns:
+            The message if found, None otherwise
+        """
+        self._ensure_loaded()
+        position = self._message_index.get(message_id)
+        if position is None:
+            return None
+        return self._messages[position]
+    
+    def _record(self, op: str, **fields: Any) -> None:
+        """
+        Report a mutation to the journal and the event bus, if attached
+        
+        Args:
+            op: Operation name
+            **fields: Operation arguments
+        """
+        record = {"op": op, "room_id": self.room_id, **fields}
+        if self.journal:
+            self.journal(record)
+        if self.bus:
+            self.bus.publish(room_topic(self.room_id), record)
     
     def add_message(self,
                    sender: User,
                    content: str,
                    message_type: str = "text",
                    media_url: Optional[str] = None,
-                   reply_to: Optional[str] = None) -> str:
+                   reply_to: Optional[str] = None) -> Optional[str]:
         """
         Add a new message to the room
         
@@ -65,22 +380,33 @@ class ChatRoom:
             reply_to: Optional ID of message being replied to
             
         Returns:
-            ID of the new message
+            ID of the new message, or None if slow mode holds the sender back
         """
+        # Histories stored before intervals were validated may hold 0; that means no limit
+        interval = self.settings.get("slow_mode_interval", 0)
+        if (self.settings.get("slow_mode") and interval > 0 and sender.user_id not in self.moderators
+                and not self.slow_mode.allow(sender.user_id, interval)):
+            return None
+        
+        self._ensure_loaded()
         message_id = str(uuid.uuid4())
-        message = {
-            "message_id": message_id,
-            "sender_id": sender.user_id,
-            "sender_name": sender.full_name,
-            "content": content,
-            "type": message_type,
-            "media_url": media_url,
-            "reply_to": reply_to,
-            "timestamp": datetime.now(),
-            "edited": False,
-            "reactions": {}
-        }
-        self.messages.append(message)
+        if self.muted_word_filter:
+            content = self.muted_word_filter.censor(content)
+        message = RoomMessage(message_id=message_id,
+                              sender_id=sender.user_id,
+                              sender_name=sender.full_name,
+                              content=content,
+                              type=message_type,
+                              media_url=media_url,
+                              reply_to=reply_to)
+        position = len(self._messages)
+        self._message_index[message_id] = position
+        self._messages.append(message)
+        for name, keys_of in self._sender_index_keys.items():
+            for key in keys_of(sender.user_id):
+                self._sender_indexes[name].setdefault(key, []).append(position)
+        self._touch()
+        self._record("add_message", message=message)
         return message_id
     
     def edit_message(self,
@@ -98,15 +424,21 @@ class ChatRoom:
         Returns:
             True if edit was successful, False otherwise
         """
-        for message in self.messages:
-            if message["message_id"] == message_id:
-                if message["sender_id"] == editor.user_id or editor.user_id in self.moderators:
-                    message["content"] = new_content
-                    message["edited"] = True
-                    message["edited_by"] = editor.user_id
-                    message["edited_at"] = datetime.now()
-                    return True
-                break
+        message = self._get_message(message_id)
+        if message and (message["sender_id"] == editor.user_id or editor.user_id in self.moderators):
+            if self.muted_word_filter:
+                new_content = self.muted_word_filter.censor(new_content)
+            message["content"] = new_content
+            message["edited"] = True
+            message["edited_by"] = editor.user_id
+            message["edited_at"] = datetime.now()
+            self._touch(message_id)
+            self._record("edit_message",
+                         message_id=message_id,
+                         content=new_content,
+                         edited_by=editor.user_id,
+                         edited_at=message["edited_at"])
+            return True
         return False
     
     def delete_message(self,
@@ -122,12 +454,16 @@ class ChatRoom:
         Returns:
             True if deletion was successful, False otherwise
         """
-        for i, message in enumerate(self.messages):
-            if message["message_id"] == message_id:
-                if message["sender_id"] == deleter.user_id or deleter.user_id in self.moderators:
-                    self.messages.pop(i)
-                    return True
-                break
+        message = self._get_message(message_id)
+        if message and (message["sender_id"] == deleter.user_id or deleter.user_id in self.moderators):
+            # Leave a tombstone; the list is compacted once they pile up
+            self._messages[self._message_index.pop(message_id)] = None
+            self._tombstones += 1
+            if self._tombstones > MAX_TOMBSTONE_FRACTION * len(self._messages):
+                self._compact_messages()
+            self._touch(message_id)
+            self._record("delete_message", message_id=message_id)
+            return True
         return False
     
     def add_reaction(self,
@@ -145,13 +481,14 @@ class ChatRoom:
         Returns:
             True if reaction was added, False otherwise
         """
-        for message in self.messages:
-            if message["message_id"] == message_id:
-                if user.user_id not in message["reactions"]:
-                    message["reactions"][user.user_id] = []
-                if reaction not in message["reactions"][user.user_id]:
-                    message["reactions"][user.user_id].append(reaction)
-                return True
+        message = self._get_message(message_id)
+        if message:
+            if user.user_id not in message["reactions"]:
+                message["reactions"][user.user_id] = []
+            if reaction not in message["reactions"][user.user_id]:
+                message["reactions"][user.user_id].append(reaction)
+                self._record("add_reaction", message_id=message_id, user_id=user.user_id, reaction=reaction)
+            return True
         return False
     
     def remove_reaction(self,
@@ -169,13 +506,13 @@ class ChatRoom:
         Returns:
             True if reaction was removed, False otherwise
         """
-        for message in self.messages:
-            if message["message_id"] == message_id:
-                if user.user_id in message["reactions"] and reaction in message["reactions"][user.user_id]:
-                    message["reactions"][user.user_id].remove(reaction)
-                    if not message["reactions"][user.user_id]:
-                        del message["reactions"][user.user_id]
-                    return True
+        message = self._get_message(message_id)
+        if message and user.user_id in message["reactions"] and reaction in message["reactions"][user.user_id]:
+            message["reactions"][user.user_id].remove(reaction)
+            if not message["reactions"][user.user_id]:
+                del message["reactions"][user.user_id]
+            self._record("remove_reaction", message_id=message_id, user_id=user.user_id, reaction=reaction)
+            return True
         return False
     
     def pin_message(self, message_id: str) -> bool:
@@ -188,11 +525,12 @@ class ChatRoom:
         Returns:
             True if message was pinned, False otherwise
         """
-        for message in self.messages:
-            if message["message_id"] == message_id:
-                if message_id not in self.pinned_messages:
-                    self.pinned_messages.append(message_id)
-                return True
+        self._ensure_loaded()
+        if message_id in self._message_index:
+            if message_id not in self.pinned_messages:
+                self.pinned_messages.append(message_id)
+                self._record("pin_message", message_id=message_id)
+            return True
         return False
     
     def unpin_message(self, message_id: str) -> bool:
@@ -207,6 +545,7 @@ class ChatRoom:
         """
         if message_id in self.pinned_messages:
             self.pinned_messages.remove(message_id)
+            self._record("unpin_message", message_id=message_id)
             return True
         return False
     
@@ -254,6 +593,7 @@ class ChatRoom:
         """
         if user.user_id in self.participants and user.user_id not in self.moderators:
             self.moderators.add(user.user_id)
+            self._record("add_moderator", user_id=user.user_id)
             return True
         return False
     
@@ -269,6 +609,7 @@ class ChatRoom:
         """
         if user.user_id in self.moderators and user.user_id != self.created_by.user_id:
             self.moderators.remove(user.user_id)
+            self._record("remove_moderator", user_id=user.user_id)
             return True
         return False
     
@@ -278,8 +619,23 @@ class ChatRoom:
         
         Args:
             settings: Dictionary of settings to update
+            
+        Raises:
+            ValueError: If slow_mode_interval is not a positive number of seconds
         """
+        if "slow_mode_interval" in settings:
+            interval = settings["slow_mode_interval"]
+            if isinstance(interval, bool) or not isinstance(interval, (int, float)) or not interval > 0:
+                raise ValueError("slow_mode_interval must be a positive number of seconds")
         self.settings.update(settings)
+        if "muted_words" in settings:
+            self._compile_muted_words()
+        self._record("update_settings", settings=settings)
+    
+    def _compile_muted_words(self) -> None:
+        """Rebuild the muted-word matcher from the settings"""
+        muted_word_filter = MutedWordFilter(self.settings.get("muted_words", []))
+        self.muted_word_filter = muted_word_filter if muted_word_filter else None
     
     def to_dict(self) -> Dict[str, Union[str, datetime, Dict]]:
         """
@@ -309,7 +665,7 @@ class ChatRoom:
         Create a chat room from dictionary data
         
         Args:
-            data: Dictionary containing chat room data
+            data: Dictionary containing chat room data (messages may be left out)
             created_by: User who created the room
             
         Returns:
@@ -325,22 +681,41 @@ class ChatRoom:
         )
         
         room.created_at = datetime.fromisoformat(data["created_at"])
-        room.messages = data["messages"]
+        if "messages" in data:  # absent when the history is loaded separately (see defer_messages)
+            room.messages = data["messages"]
         room.participants = set(data["participants"])
         room.moderators = set(data["moderators"])
         room.pinned_messages = data["pinned_messages"]
         room.settings = data["settings"]
+        room._compile_muted_words()
         
         return room
 
 class ChatManager:
     """Class managing chat rooms and user interactions"""
     
-    def __init__(self):
-        """Initialize the chat manager"""
+    def __init__(self, storage: Optional[StorageBackend] = None):
+        """
+        Initialize the chat manager
+        
+        Args:
+            storage: Persistence engine (defaults to JSON snapshot + log in data/)
+        """
+        self.storage = storage or JsonStorage()
+        self.users = UserRepository(self.storage)
+        self.locations = LocationDirectory()
+        self.combat_roles: Dict[str, CombatRole] = {}  # user_id -> combat role of registered soldiers
+        self.bus = EventBus()
         self.rooms: Dict[str, ChatRoom] = {}
         self.user_rooms: Dict[str, Set[str]] = {}  # user_id -> set of room_ids
-        self.direct_messages: Dict[str, Dict[str, List[Dict[str, Union[str, datetime, Dict]]]]] = {}  # user_id -> {other_user_id -> messages}
+        self.conversations: Dict[str, List[Dict[str, Union[str, datetime, Dict]]]] = {}  # conversation key -> messages
+        self._conversation_index: Dict[str, Dict[str, int]] = {}  # conversation key -> {message_id -> position}
+        self.user_conversations: Dict[str, Dict[str, str]] = {}  # user_id -> {other_user_id -> conversation key}
+        self.read_positions: Dict[str, Dict[str, int]] = {}  # user_id -> {other_user_id -> messages read so far}
+        self.unread_counts: Dict[str, Dict[str, int]] = {}  # user_id -> {other_user_id -> unread messages}
+        self.unread_totals: Dict[str, int] = {}  # user_id -> unread messages across conversations
+        self.search_index: Optional[SearchIndex] = None  # built on the first search
+        self._search_indexed_rooms: Set[str] = set()  # rooms whose history is in search_index
         self.load_data()
     
     def create_room(self,
@@ -370,7 +745,9 @@ class ChatManager:
             self.user_rooms[created_by.user_id] = set()
         self.user_rooms[created_by.user_id].add(room_id)
         
-        self.save_data()
+        self.storage.append({"op": "create_room", "room": room.to_dict()})
+        room.journal = self.storage.append
+        room.bus = self.bus
         return room
     
     def get_room(self, room_id: str) -> Optional[ChatRoom]:
@@ -413,7 +790,7 @@ class ChatManager:
             if user.user_id not in self.user_rooms:
                 self.user_rooms[user.user_id] = set()
             self.user_rooms[user.user_id].add(room.room_id)
-            self.save_data()
+            self.storage.append({"op": "join_room", "room_id": room.room_id, "user_id": user.user_id})
             return True
         return False
     
@@ -432,7 +809,7 @@ class ChatManager:
             self.user_rooms[user.user_id].remove(room.room_id)
             if not self.user_rooms[user.user_id]:
                 del self.user_rooms[user.user_id]
-            self.save_data()
+            self.storage.append({"op": "leave_room", "room_id": room.room_id, "user_id": user.user_id})
             return True
         return False
     
@@ -456,39 +833,66 @@ class ChatManager:
             ID of the new message
         """
         message_id = str(uuid.uuid4())
-        message = {
-            "message_id": message_id,
-            "sender_id": sender.user_id,
-            "sender_name": sender.full_name,
-            "content": content,
-            "type": message_type,
-            "media_url": media_url,
-            "timestamp": datetime.now(),
-            "read": False
-        }
+        message = DirectMessage(message_id=message_id,
+                                sender_id=sender.user_id,
+                                sender_name=sender.full_name,
+                                content=content,
+                                type=message_type,
+                                media_url=media_url)
         
-        # Initialize direct message storage if needed
-        if sender.user_id not in self.direct_messages:
-            self.direct_messages[sender.user_id] = {}
-        if recipient.user_id not in self.direct_messages[sender.user_id]:
-            self.direct_messages[sender.user_id][recipient.user_id] = []
+        # Initialize the conversation and both users' indexes if needed
+        key = conversation_key(sender.user_id, recipient.user_id)
+        if key not in self.conversations:
+            self.conversations[key] = []
+            self._conversation_index[key] = {}
+            self.user_conversations.setdefault(sender.user_id, {})[recipient.user_id] = key
+            self.user_conversations.setdefault(recipient.user_id, {})[sender.user_id] = key
         
-        if recipient.user_id not in self.direct_messages:
-            self.direct_messages[recipient.user_id] = {}
-        if sender.user_id not in self.direct_messages[recipient.user_id]:
-            self.direct_messages[recipient.user_id][sender.user_id] = []
+        # Store the message once, in the shared conversation
+        self._conversation_index[key][message_id] = len(self.conversations[key])
+        self.conversations[key].append(message)
         
-        # Add message to both users' conversation
-        self.direct_messages[sender.user_id][recipient.user_id].append(message)
-        self.direct_messages[recipient.user_id][sender.user_id].append(message)
+        # Update the recipient's unread counters
+        peer_counts = self.unread_counts.setdefault(recipient.user_id, {})
+        peer_counts[sender.user_id] = peer_counts.get(sender.user_id, 0) + 1
+        self.unread_totals[recipient.user_id] = self.unread_totals.get(recipient.user_id, 0) + 1
         
-        self.save_data()
+        record = {
+            "op": "send_direct_message",
+            "sender_id": sender.user_id,
+            "recipient_id": recipient.user_id,
+            "message": message
+        }
+        self.storage.append(record)
+        self.bus.publish(dm_topic(sender.user_id, recipient.user_id), record)
         return message_id
     
+    def get_messages(self,
+                     room_id: str,
+                     before: Optional[str] = None,
+                     limit: int = 50) -> List[Dict[str, Union[str, datetime, Dict]]]:
+        """
+        Get a page of a room's message history
+        
+        Args:
+            room_id: ID of the room
+            before: Optional ID of a message; only older messages are returned
+            limit: Maximum number of messages to return
+            
+        Returns:
+            Up to limit messages in chronological order
+        """
+        room = self.rooms.get(room_id)
+        if not room:
+            return []
+        return room.get_messages(before, limit)
+    
     def get_direct_messages(self,
                           user1: User,
                           user2: User,
-                          limit: Optional[int] = None) -> List[Dict[str, Union[str, datetime, Dict]]]:
+                          limit: Optional[int] = None,
+                          before: Optional[str] = None,
+                          after: Optional[str] = None) -> List[Dict[str, Union[str, datetime, Dict]]]:
         """
         Get direct messages between two users
         
@@ -496,30 +900,74 @@ class ChatManager:
             user1: First user
             user2: Second user
             limit: Optional limit on number of messages to return
+            before: Optional message ID; only older messages are returned
+            after: Optional message ID; only newer messages are returned
             
         Returns:
-            List of messages
+            List of messages (the newest page, or the oldest page after "after")
         """
-        if user1.user_id in self.direct_messages and user2.user_id in self.direct_messages[user1.user_id]:
-            messages = self.direct_messages[user1.user_id][user2.user_id]
+        key = self.user_conversations.get(user1.user_id, {}).get(user2.user_id)
+        if key:
+            messages = self.conversations[key]
+            if before is None and after is None:
+                if limit:
+                    return messages[-limit:]
+                return messages
+            
+            positions = self._conversation_index[key]
+            start, end = 0, len(messages)
+            if after is not None:
+                if after not in positions:
+                    return []
+                start = positions[after] + 1
+            if before is not None:
+                if before not in positions:
+                    return []
+                end = positions[before]
             if limit:
-                return messages[-limit:]
-            return messages
+                if after is not None:
+                    end = min(end, start + limit)
+                else:
+                    start = max(start, end - limit)
+            return messages[start:end]
         return []
     
     def mark_messages_read(self, user: User, other_user: User) -> None:
         """
         Mark all messages from another user as read
         
+        Only messages past the user's read watermark for the conversation are
+        visited, and nothing is persisted when there is nothing new to mark.
+        
         Args:
             user: User marking messages as read
             other_user: User whose messages to mark as read
         """
-        if user.user_id in self.direct_messages and other_user.user_id in self.direct_messages[user.user_id]:
-            for message in self.direct_messages[user.user_id][other_user.user_id]:
-                if message["sender_id"] == other_user.user_id:
-                    message["read"] = True
-            self.save_data()
+        key = self.user_conversations.get(user.user_id, {}).get(other_user.user_id)
+        if key:
+            messages = self.conversations[key]
+            read_positions = self.read_positions.setdefault(user.user_id, {})
+            start = read_positions.get(other_user.user_id, 0)
+            if start >= len(messages):
+                return
+            
+            for position in range(start, len(messages)):
+                if messages[position]["sender_id"] == other_user.user_id:
+                    messages[position]["read"] = True
+            read_positions[other_user.user_id] = len(messages)
+            
+            unread = self.unread_counts.get(user.user_id, {}).pop(other_user.user_id, 0)
+            if unread:
+                self.unread_totals[user.user_id] -= unread
+            
+            record = {
+                "op": "mark_messages_read",
+                "user_id": user.user_id,
+                "other_user_id": other_user.user_id,
+                "position": len(messages)
+            }
+            self.storage.append(record)
+            self.bus.publish(dm_topic(user.user_id, other_user.user_id), record)
     
     def get_unread_count(self, user: User) -> int:
         """
@@ -531,57 +979,223 @@ class ChatManager:
         Returns:
             Number of unread messages
         """
-        count = 0
-        if user.user_id in self.direct_messages:
-            for other_user_id, messages in self.direct_messages[user.user_id].items():
-                for message in messages:
-                    if message["sender_id"] != user.user_id and not message["read"]:
-                        count += 1
-        return count
+        return self.unread_totals.get(user.user_id, 0)
+    
+    def get_unread_counts(self, user: User) -> Dict[str, int]:
+        """
+        Get the number of unread messages per conversation partner
+        
+        Args:
+            user: User to get unread counts for
+            
+        Returns:
+            Dictionary mapping other user IDs to unread message counts
+        """
+        return dict(self.unread_counts.get(user.user_id, {}))
     
     def save_data(self) -> None:
-        """Save chat data to files"""
-        data_dir = "data"
-        os.makedirs(data_dir, exist_ok=True)
+        """Compact persisted chat data right away"""
+        self.storage.compact()
+    
+    def _room_creator(self, room_data: Dict[str, Any]) -> User:
+        """
+        Resolve the creator of a stored room
         
-        # Save rooms
-        rooms_data = {room_id: room.to_dict() for room_id, room in self.rooms.items()}
-        with open(os.path.join(data_dir, "rooms.json"), 'w', encoding='utf-8') as f:
-            json.dump(rooms_data, f, ensure_ascii=False, indent=4)
+        Args:
+            room_data: Serialized room
+            
+        Returns:
+            The creator, or a bare user carrying only the ID if no profile is stored
+        """
+        creator = self.users.get(room_data["created_by"])
+        if creator is None:
+            user_types = {user_type.value for user_type in UserType}
+            user_type = room_data["room_type"] if room_data["room_type"] in user_types else UserType.SOLDIER.value
+            creator = User(room_data["created_by"], "", "", UserType(user_type))
+        return creator
+    
+    def load_data(self) -> None:
+        """Load chat data from storage"""
+        state = self.storage.load_state()
         
-        # Save user rooms
-        user_rooms_data = {user_id: list(room_ids) for user_id, room_ids in self.user_rooms.items()}
-        with open(os.path.join(data_dir, "user_rooms.json"), 'w', encoding='utf-8') as f:
-            json.dump(user_rooms_data, f, ensure_ascii=False, indent=4)
+        # Room metadata is restored right away; each room's history is read
+        # from storage only when the room is opened. Rooms created since the
+        # last compaction come with their (short) history.
+        self.rooms = {}
+        for room_id, room_data in state["rooms"].items():
+            room = ChatRoom.from_dict(room_data, self._room_creator(room_data))
+            if "messages" not in room_data:
+                room.defer_messages(lambda room_id=room_id: self.storage.load_room_messages(room_id))
+            room.journal = self.storage.append
+            room.bus = self.bus
+            self.rooms[room_id] = room
         
-        # Save direct messages
-        with open(os.path.join(data_dir, "direct_messages.json"), 'w', encoding='utf-8') as f:
-            json.dump(self.direct_messages, f, ensure_ascii=False, indent=4)
+        self.user_rooms = {user_id: set(room_ids) for user_id, room_ids in state["user_rooms"].items()}
+        self.conversations = {key: [DirectMessage.from_dict(message) for message in messages]
+                              for key, messages in state["conversations"].items()}
+        self._conversation_index = {key: {message["message_id"]: i for i, message in enumerate(messages)}
+                                    for key, messages in self.conversations.items()}
+        self.user_conversations = state["user_conversations"]
+        self.read_positions = state.get("read_positions", {})
+        
+        # Count unread messages past each read watermark once; sends and reads keep them current
+        self.unread_counts = {}
+        self.unread_totals = {}
+        for user_id, peers in self.user_conversations.items():
+            positions = self.read_positions.get(user_id, {})
+            for other_user_id, key in peers.items():
+                messages = self.conversations[key]
+                unread = 0
+                for position in range(positions.get(other_user_id, 0), len(messages)):
+                    message = messages[position]
+                    if message["sender_id"] == other_user_id and not message["read"]:
+                        unread += 1
+                if unread:
+                    self.unread_counts.setdefault(user_id, {})[other_user_id] = unread
+                    self.unread_totals[user_id] = self.unread_totals.get(user_id, 0) + unread
     
-    def load_data(self) -> None:
-        """Load chat data from files"""
-        data_dir = "data"
-        
-        # Load rooms
-        try:
-            with open(os.path.join(data_dir, "rooms.json"), 'r', encoding='utf-8') as f:
-                rooms_data = json.load(f)
-                # Note: Rooms need to be recreated with proper User objects
-                # This is handled when users log in and join rooms
-        except FileNotFoundError:
-            rooms_data = {}
-        
-        # Load user rooms
-        try:
-            with open(os.path.join(data_dir, "user_rooms.json"), 'r', encoding='utf-8') as f:
-                user_rooms_data = json.load(f)
-                self.user_rooms = {user_id: set(room_ids) for user_id, room_ids in user_rooms_data.items()}
-        except FileNotFoundError:
-            self.user_rooms = {}
-        
-        # Load direct messages
-        try:
-            with open(os.path.join(data_dir, "direct_messages.json"), 'r', encoding='utf-8') as f:
-                self.direct_messages = json.load(f)
-        except FileNotFoundError:
-            self.direct_messages = {} 
\ No newline at end of file
+    def _get_search_index(self) -> SearchIndex:
+        """
+        Get the search index, building it from the current history on first use
+        
+        Deferred room histories are left out; search indexes them the first
+        time a user searches one of those rooms.
+        
+        Returns:
+            Index kept current through the event bus
+        """
+        if self.search_index is None:
+            index = SearchIndex()
+            self.bus.subscribe(ALL_EVENTS, index.handle_event)
+            for room_id, room in self.rooms.items():
+                if room.messages_loaded:
+                    self._index_room_history(index, room_id)
+            for user_id, peers in self.user_conversations.items():
+                for other_user_id, key in peers.items():
+                    if user_id < other_user_id:
+                        for message in self.conversations[key]:
+                            index.add(dm_topic(user_id, other_user_id), message)
+            self.search_index = index
+        return self.search_index
+    
+    def _index_room_history(self, index: SearchIndex, room_id: str) -> None:
+        """
+        Add a room's current history to the search index
+        
+        Messages added since the room was loaded may already be indexed
+        through the event bus; SearchIndex.add skips them.
+        
+        Args:
+            index: Search index
+            room_id: ID of the room
+        """
+        for message in self.rooms[room_id].messages:
+            index.add(room_topic(room_id), message)
+        self._search_indexed_rooms.add(room_id)
+    
+    def search(self, user: User, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Search the history of a user's rooms and direct-message conversations
+        
+        Args:
+            user: User searching (only their rooms and conversations are searched)
+            query: Words to find; a trailing * or the last, unfinished word matches as a prefix
+            limit: Maximum number of results
+            
+        Returns:
+            Best matches first, each a dictionary with the message, its room_id
+            (None for direct messages), other_user_id (None for rooms) and score
+        """
+        scopes = {room_topic(room_id) for room_id in self.user_rooms.get(user.user_id, ())}
+        scopes.update(dm_topic(user.user_id, other_user_id)
+                      for other_user_id in self.user_conversations.get(user.user_id, {}))
+        index = self._get_search_index()
+        for room_id in self.user_rooms.get(user.user_id, ()):
+            if room_id in self.rooms and room_id not in self._search_indexed_rooms:
+                self._index_room_history(index, room_id)
+        results = []
+        for scope, message, score in index.search(query, scopes, limit):
+            in_room = scope[0] == "room"
+            results.append({
+                "message": message,
+                "room_id": scope[1] if in_room else None,
+                "other_user_id": None if in_room else (scope[2] if scope[1] == user.user_id else scope[1]),
+                "score": score
+            })
+        return results
+    
+    def add_user(self, user: User) -> None:
+        """
+        Make a logged-in user the repository's tracked instance (so changes
+        made through it are saved) and index them for the sender indexes
+        
+        Args:
+            user: User who logged in
+        """
+        self.users.adopt(user)
+        if isinstance(user, Soldier):
+            self.set_combat_role(user.user_id, user.combat_role)
+        if isinstance(user, Evacuee):
+            self.locations.add(user.user_id, user.full_name, user.evacuated_from, user.evacuated_to)
+    
+    def set_combat_role(self, user_id: str, combat_role: CombatRole) -> None:
+        """
+        Record a soldier's combat role (seeded from the registered users),
+        re-filing their messages if the role changed
+        
+        Args:
+            user_id: ID of the soldier
+            combat_role: The soldier's combat role
+        """
+        if self.combat_roles.get(user_id) == combat_role:
+            return
+        known = user_id in self.combat_roles
+        self.combat_roles[user_id] = combat_role
+        if known or any(room.has_sender_index("combat_role") for room in self.rooms.values()):
+            # Rooms indexed earlier filed this sender under their old role (or none)
+            for room in self.rooms.values():
+                room.refresh_sender_index("combat_role")
+    
+    def _combat_roles_of(self, user_id: str) -> Tuple[CombatRole, ...]:
+        """Get the combat role of a sender as sender-index keys (none for non-soldiers)"""
+        combat_role = self.combat_roles.get(user_id) or getattr(self.users.get(user_id), "combat_role", None)
+        return (combat_role,) if combat_role else ()
+    
+    def index_room_by_combat_role(self, room: ChatRoom) -> None:
+        """
+        Maintain the room's "combat_role" sender index (built on first use)
+        
+        Args:
+            room: Room to index
+        """
+        if not room.has_sender_index("combat_role"):
+            room.index_by_sender("combat_role", self._combat_roles_of)
+    
+    def index_room_by_location(self, room: ChatRoom) -> None:
+        """
+        Maintain the room's "location" sender index, filing evacuees' messages
+        under the location keys they evacuated from and to (built on first use)
+        
+        Args:
+            room: Room to index
+        """
+        if not room.has_sender_index("location"):
+            room.index_by_sender("location", self.locations.location_keys)
+    
+    def get_room_participants(self, room_id: str) -> List[User]:
+        """
+        Get the participants of a room (profiles only, records load on access)
+        
+        Args:
+            room_id: ID of the room
+            
+        Returns:
+            List of participating users
+        """
+        room = self.rooms.get(room_id)
+        return self.users.get_many(room.participants) if room else []
+    
+    def close(self) -> None:
+        """Flush pending writes and release storage resources"""
+        self.users.close()
+        self.storage.close()
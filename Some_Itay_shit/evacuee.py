@@ -1,6 +1,6 @@
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
-from .user import User, UserType
+from user import User, UserType
 
 class Evacuee(User):
     """Class representing an evacuee in the system"""
@@ -68,6 +68,7 @@ class Evacuee(User):
             self.contact_info["email"] = email
         if address:
             self.contact_info["address"] = address
+        self._changed()
     
     def set_emergency_contact(self,
                             name: str,
@@ -136,6 +137,7 @@ class Evacuee(User):
             "notes": notes
         }
         self.medical_conditions.append(record)
+        self._changed()
     
     def add_note(self,
                 content: str,
@@ -153,6 +155,7 @@ class Evacuee(User):
             "timestamp": datetime.now()
         }
         self.notes.append(note)
+        self._changed()
     
     def add_support_request(self,
                           request_type: str,
@@ -177,6 +180,7 @@ class Evacuee(User):
             "status": "pending"
         }
         self.support_requests.append(request)
+        self._changed()
     
     def get_active_support_requests(self) -> List[Dict[str, Union[str, datetime, bool]]]:
         """
@@ -0,0 +1,77 @@
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+import threading
+
+ALL_EVENTS = "*"  # topic receiving every published event
+
+def room_topic(room_id: str) -> Tuple[str, str]:
+    """
+    Get the topic of a chat room's events
+
+    Args:
+        room_id: ID of the room
+
+    Returns:
+        Topic key
+    """
+    return ("room", room_id)
+
+def dm_topic(user1_id: str, user2_id: str) -> Tuple[str, str, str]:
+    """
+    Get the topic of a direct-message conversation's events
+
+    Args:
+        user1_id: ID of one participant
+        user2_id: ID of the other participant
+
+    Returns:
+        Topic key (the same for both argument orders)
+    """
+    first, second = sorted((user1_id, user2_id))
+    return ("dm", first, second)
+
+class EventBus:
+    """Thread-safe publish/subscribe hub for chat events"""
+
+    def __init__(self):
+        """Initialize an empty bus"""
+        self._subscribers: Dict[Hashable, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self,
+                  topic: Hashable,
+                  callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """
+        Subscribe to a topic
+
+        Args:
+            topic: Topic key, or ALL_EVENTS for every event
+            callback: Called with each event, on the publisher's thread
+
+        Returns:
+            Function that cancels the subscription
+        """
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                callbacks = self._subscribers.get(topic, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+                if not callbacks:
+                    self._subscribers.pop(topic, None)
+
+        return unsubscribe
+
+    def publish(self, topic: Hashable, event: Dict[str, Any]) -> None:
+        """
+        Deliver an event to the topic's subscribers and to ALL_EVENTS subscribers
+
+        Args:
+            topic: Topic key
+            event: Event payload
+        """
+        with self._lock:
+            callbacks = self._subscribers.get(topic, []) + self._subscribers.get(ALL_EVENTS, [])
+        for callback in callbacks:
+            callback(event)
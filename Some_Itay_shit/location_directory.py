@@ -0,0 +1,133 @@
+from typing import Dict, List, Optional, Set, Tuple
+import threading
+from search_index import normalize_text
+
+def location_key(location: Optional[str]) -> str:
+    """
+    Get the key a location is filed under (so "Sderot " and "sderot" match)
+
+    Args:
+        location: Location as entered
+
+    Returns:
+        Normalized location, empty if none was given
+    """
+    return " ".join(normalize_text(location or "").split())
+
+class LocationDirectory:
+    """
+    Directory of evacuees by the location they evacuated from and to
+
+    Kept current as evacuees register and log in; every lookup costs
+    O(result) rather than a scan over all users.
+    """
+
+    def __init__(self):
+        """Initialize an empty directory"""
+        self._names: Dict[str, str] = {}  # location key -> location as first entered
+        self._evacuated_from: Dict[str, Set[str]] = {}  # location key -> user IDs
+        self._evacuated_to: Dict[str, Set[str]] = {}  # location key -> user IDs
+        self._users: Dict[str, Tuple[str, str, str]] = {}  # user_id -> (full name, from key, to key)
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, full_name: str, evacuated_from: Optional[str], evacuated_to: Optional[str]) -> None:
+        """
+        Add an evacuee, or move one already listed
+
+        Args:
+            user_id: ID of the evacuee
+            full_name: Name to list the evacuee under
+            evacuated_from: Location evacuated from
+            evacuated_to: Location evacuated to
+        """
+        from_key, to_key = location_key(evacuated_from), location_key(evacuated_to)
+        with self._lock:
+            self._discard(user_id)
+            self._users[user_id] = (full_name, from_key, to_key)
+            for key, location, users in ((from_key, evacuated_from, self._evacuated_from),
+                                         (to_key, evacuated_to, self._evacuated_to)):
+                if key:
+                    self._names.setdefault(key, location.strip())
+                    users.setdefault(key, set()).add(user_id)
+
+    def _discard(self, user_id: str) -> None:
+        """Remove an evacuee's current entries (lock held)"""
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return
+        for key, users in ((entry[1], self._evacuated_from), (entry[2], self._evacuated_to)):
+            if key in users:
+                users[key].discard(user_id)
+                if not users[key]:
+                    del users[key]
+                    if key not in self._evacuated_from and key not in self._evacuated_to:
+                        del self._names[key]
+
+    def locations(self) -> List[str]:
+        """
+        Get every location someone evacuated from or to
+
+        Returns:
+            Location names in alphabetical order
+        """
+        with self._lock:
+            return sorted(self._names.values())
+
+    def location_keys(self, user_id: str) -> Tuple[str, ...]:
+        """
+        Get the keys of the locations an evacuee evacuated from and to
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            Location keys (none for users who are not listed)
+        """
+        entry = self._users.get(user_id)
+        if entry is None:
+            return ()
+        return tuple(dict.fromkeys(key for key in entry[1:] if key))
+
+    def evacuated_from(self, location: str) -> Set[str]:
+        """
+        Get the evacuees who evacuated from a location
+
+        Args:
+            location: Location name
+
+        Returns:
+            User IDs
+        """
+        with self._lock:
+            return set(self._evacuated_from.get(location_key(location), ()))
+
+    def evacuated_to(self, location: str) -> Set[str]:
+        """
+        Get the evacuees who evacuated to a location
+
+        Args:
+            location: Location name
+
+        Returns:
+            User IDs
+        """
+        with self._lock:
+            return set(self._evacuated_to.get(location_key(location), ()))
+
+    def neighbours(self, user_id: str) -> List[Tuple[str, str]]:
+        """
+        Get the other evacuees from the same town as a user
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            (user ID, full name) pairs sorted by name
+        """
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or not entry[1]:
+                return []
+            return sorted(((other_id, self._users[other_id][0])
+                           for other_id in self._evacuated_from[entry[1]] if other_id != user_id),
+                          key=lambda neighbour: neighbour[1])
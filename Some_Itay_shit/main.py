@@ -1,5 +1,7 @@
 import tkinter as tk
-from typing import Optional
+from typing import Dict, Optional
+import os
+import sys
 from welcome_screen import WelcomeScreen
 from chat_interface import (
     ChatInterface,
@@ -8,11 +10,18 @@ from chat_interface import (
     PsychologistChatInterface
 )
 from chat_manager import ChatManager
-from user import User, UserType
+from user import User, UserType, CombatRole
 from soldier import Soldier
 from evacuee import Evacuee
 from psychologist import Psychologist
 
+# The AI assistant lives at the repository root; the app runs without it
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from AI import stream_in_background, warm_up
+except ImportError:
+    stream_in_background = warm_up = None
+
 class SupportChatApp:
     """Main application class for the Support Chat System"""
     
@@ -27,16 +36,43 @@ class SupportChatApp:
         self.chat_manager = ChatManager()
         
         # Initialize screens
-        self.welcome_screen = WelcomeScreen(self.root, self.on_login)
+        self.welcome_screen = WelcomeScreen(self.root, self.on_login, self.on_register)
+        # Index the soldiers and evacuees registered in earlier runs
+        for user_type in ("soldiers", "evacuees"):
+            for record in self.welcome_screen.user_index.get(user_type, {}).values():
+                self.on_register(user_type, record)
         self.chat_interface: Optional[ChatInterface] = None
         
         # Show welcome screen
         self.welcome_screen.show()
         
+        # Prepare the AI assistant once the window is drawn
+        if warm_up:
+            self.root.after_idle(warm_up)
+        
         # Configure grid weights
         self.root.grid_columnconfigure(0, weight=1)
         self.root.grid_rowconfigure(0, weight=1)
     
+    def on_register(self, user_type: str, record: Dict) -> None:
+        """
+        Index a registered user for the combat role filter and location directory
+        
+        Args:
+            user_type: Key of the user's list in users.json
+            record: Registration record
+        """
+        if user_type == "soldiers":
+            try:
+                self.chat_manager.set_combat_role(record["id"], CombatRole(record.get("combat_role")))
+            except ValueError:
+                pass  # Not one of the filterable roles
+        elif user_type == "evacuees":
+            self.chat_manager.locations.add(record["id"],
+                                            f"{record['first_name']} {record['last_name']}",
+                                            record.get("evacuated_from"),
+                                            record.get("evacuated_to"))
+    
     def on_login(self, user: User) -> None:
         """
         Handle successful login
@@ -47,34 +83,41 @@ class SupportChatApp:
         # Hide welcome screen
         self.welcome_screen.hide()
         
+        # Let sender indexes (combat role, location) resolve this user
+        self.chat_manager.add_user(user)
+        
         # Create appropriate chat interface
         if isinstance(user, Soldier):
             self.chat_interface = SoldierChatInterface(
                 self.root,
                 self.chat_manager,
                 user,
-                self.on_logout
+                self.on_logout,
+                stream_in_background
             )
         elif isinstance(user, Evacuee):
             self.chat_interface = EvacueeChatInterface(
                 self.root,
                 self.chat_manager,
                 user,
-                self.on_logout
+                self.on_logout,
+                stream_in_background
             )
         elif isinstance(user, Psychologist):
             self.chat_interface = PsychologistChatInterface(
                 self.root,
                 self.chat_manager,
                 user,
-                self.on_logout
+                self.on_logout,
+                stream_in_background
             )
         else:
             self.chat_interface = ChatInterface(
                 self.root,
                 self.chat_manager,
                 user,
-                self.on_logout
+                self.on_logout,
+                stream_in_background
             )
         
         # Show chat interface
@@ -92,6 +135,8 @@ class SupportChatApp:
     def run(self) -> None:
         """Run the application"""
         self.root.mainloop()
+        self.welcome_screen.close()
+        self.chat_manager.close()
 
 def main():
     """Application entry point"""
@@ -0,0 +1,239 @@
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Union
+from datetime import datetime
+import sys
+import time
+
+def to_epoch(value: Union[None, int, float, str, datetime]) -> Optional[int]:
+    """
+    Convert a timestamp in any of the stored formats to integer epoch seconds
+
+    Args:
+        value: Epoch number, ISO string or datetime
+
+    Returns:
+        Epoch seconds, or None if value is None
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern repeated short strings (IDs, names, types) so messages share them"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Message(MutableMapping):
+    """
+    Compact chat message
+
+    Fields live in __slots__ instead of a per-message dict, sender IDs and
+    names are interned, timestamps are integer epoch seconds and optional
+    fields cost nothing until set. The mapping interface keeps existing
+    callers working: message["timestamp"] still returns a datetime.
+    """
+
+    __slots__ = ("message_id", "sender_id", "sender_name", "content", "type", "media_url", "timestamp")
+
+    KEYS: tuple = ("message_id", "sender_id", "sender_name", "content", "type", "media_url", "timestamp")
+    OPTIONAL_KEYS: tuple = ()  # keys that only exist once set
+    DATETIME_KEYS: tuple = ("timestamp",)
+    INTERNED_KEYS: tuple = ("sender_id", "sender_name", "type")
+
+    def __init__(self,
+                 message_id: str,
+                 sender_id: str,
+                 sender_name: str,
+                 content: str,
+                 type: str = "text",
+                 media_url: Optional[str] = None,
+                 timestamp: Union[None, int, float, str, datetime] = None):
+        """
+        Initialize a message
+
+        Args:
+            message_id: Unique identifier for the message
+            sender_id: ID of the sending user
+            sender_name: Display name of the sender
+            content: Message content
+            type: Type of message (text, image, file, etc.)
+            media_url: Optional URL to media content
+            timestamp: Send time (defaults to now)
+        """
+        self.message_id = message_id
+        self.sender_id = _intern(sender_id)
+        self.sender_name = _intern(sender_name)
+        self.content = content
+        self.type = _intern(type)
+        self.media_url = media_url
+        self.timestamp = int(time.time()) if timestamp is None else to_epoch(timestamp)
+
+    def _present_keys(self) -> List[str]:
+        """Keys currently visible through the mapping interface"""
+        return list(self.KEYS) + [key for key in self.OPTIONAL_KEYS if getattr(self, key) is not None]
+
+    def _stored_value(self, key: str) -> Any:
+        """Read a field for serialization without allocating lazy fields"""
+        return getattr(self, key)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS and key not in self.OPTIONAL_KEYS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in self.OPTIONAL_KEYS:
+            raise KeyError(key)
+        if value is not None and key in self.DATETIME_KEYS:
+            return datetime.fromtimestamp(value)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.KEYS and key not in self.OPTIONAL_KEYS:
+            raise KeyError(key)
+        if key in self.DATETIME_KEYS:
+            value = to_epoch(value)
+        elif key in self.INTERNED_KEYS:
+            value = _intern(value)
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self.OPTIONAL_KEYS:
+            raise KeyError(key)
+        setattr(self, key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._present_keys())
+
+    def __len__(self) -> int:
+        return len(self._present_keys())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert message to dictionary format
+
+        Returns:
+            Dictionary representation with ISO timestamps
+        """
+        data = {}
+        for key in self._present_keys():
+            value = self._stored_value(key)
+            if value is not None and key in self.DATETIME_KEYS:
+                value = datetime.fromtimestamp(value).isoformat()
+            data[key] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Message':
+        """
+        Create a message from dictionary data
+
+        Args:
+            data: Dictionary containing message data (a stored or legacy message dict)
+
+        Returns:
+            New message instance (data itself if it already is one)
+        """
+        if isinstance(data, cls):
+            return data
+        message = cls(message_id=data["message_id"],
+                      sender_id=data["sender_id"],
+                      sender_name=data["sender_name"],
+                      content=data["content"],
+                      type=data.get("type", "text"),
+                      media_url=data.get("media_url"),
+                      timestamp=data.get("timestamp"))
+        for key in cls.KEYS[len(Message.KEYS):] + cls.OPTIONAL_KEYS:
+            if data.get(key) is not None:
+                message[key] = data[key]
+        return message
+
+class RoomMessage(Message):
+    """Message posted in a chat room"""
+
+    __slots__ = ("reply_to", "edited", "_reactions", "edited_by", "edited_at")
+
+    KEYS = Message.KEYS + ("reply_to", "edited", "reactions")
+    OPTIONAL_KEYS = ("edited_by", "edited_at")
+    DATETIME_KEYS = ("timestamp", "edited_at")
+
+    def __init__(self,
+                 message_id: str,
+                 sender_id: str,
+                 sender_name: str,
+                 content: str,
+                 type: str = "text",
+                 media_url: Optional[str] = None,
+                 timestamp: Union[None, int, float, str, datetime] = None,
+                 reply_to: Optional[str] = None):
+        """
+        Initialize a room message
+
+        Args:
+            message_id: Unique identifier for the message
+            sender_id: ID of the sending user
+            sender_name: Display name of the sender
+            content: Message content
+            type: Type of message (text, image, file, etc.)
+            media_url: Optional URL to media content
+            timestamp: Send time (defaults to now)
+            reply_to: Optional ID of message being replied to
+        """
+        super().__init__(message_id, sender_id, sender_name, content, type, media_url, timestamp)
+        self.reply_to = reply_to
+        self.edited = False
+        self._reactions: Optional[Dict[str, List[str]]] = None
+        self.edited_by: Optional[str] = None
+        self.edited_at: Optional[int] = None
+
+    @property
+    def reactions(self) -> Dict[str, List[str]]:
+        """Reactions by user ID, allocated on first use"""
+        if self._reactions is None:
+            self._reactions = {}
+        return self._reactions
+
+    @reactions.setter
+    def reactions(self, reactions: Optional[Dict[str, List[str]]]) -> None:
+        self._reactions = reactions or None
+
+    def _stored_value(self, key: str) -> Any:
+        if key == "reactions":
+            return self._reactions or {}
+        return super()._stored_value(key)
+
+class DirectMessage(Message):
+    """Message sent directly between two users"""
+
+    __slots__ = ("read",)
+
+    KEYS = Message.KEYS + ("read",)
+
+    def __init__(self,
+                 message_id: str,
+                 sender_id: str,
+                 sender_name: str,
+                 content: str,
+                 type: str = "text",
+                 media_url: Optional[str] = None,
+                 timestamp: Union[None, int, float, str, datetime] = None,
+                 read: bool = False):
+        """
+        Initialize a direct message
+
+        Args:
+            message_id: Unique identifier for the message
+            sender_id: ID of the sending user
+            sender_name: Display name of the sender
+            content: Message content
+            type: Type of message (text, image, file, etc.)
+            media_url: Optional URL to media content
+            timestamp: Send time (defaults to now)
+            read: Whether the recipient has read the message
+        """
+        super().__init__(message_id, sender_id, sender_name, content, type, media_url, timestamp)
+        self.read = read
@@ -1,6 +1,6 @@
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
-from .user import User, UserType
+from user import User, UserType
 
 class Psychologist(User):
     """Class representing a psychologist in the system"""
@@ -48,6 +48,7 @@ class Psychologist(User):
         """
         if specialization not in self.specializations:
             self.specializations.append(specialization)
+        self._changed()
     
     def remove_specialization(self, specialization: str) -> None:
         """
@@ -58,6 +59,7 @@ class Psychologist(User):
         """
         if specialization in self.specializations:
             self.specializations.remove(specialization)
+        self._changed()
     
     def set_availability(self,
                         day: str,
@@ -70,6 +72,7 @@ class Psychologist(User):
             time_slots: List of available time slots
         """
         self.availability[day] = time_slots
+        self._changed()
     
     def add_patient(self,
                    patient_id: str,
@@ -94,6 +97,7 @@ class Psychologist(User):
             "status": "active"
         }
         self.current_patients.append(patient)
+        self._changed()
     
     def end_patient_treatment(self,
                             patient_id: str,
@@ -114,6 +118,7 @@ class Psychologist(User):
                 patient["status"] = "completed"
                 self.patient_history.append(self.current_patients.pop(i))
                 break
+        self._changed()
     
     def add_session_note(self,
                         patient_id: str,
@@ -145,6 +150,7 @@ class Psychologist(User):
             if patient["patient_id"] == patient_id:
                 patient["sessions"].append(session)
                 break
+        self._changed()
     
     def add_emergency_contact(self,
                             name: str,
@@ -167,6 +173,7 @@ class Psychologist(User):
             "email": email
         }
         self.emergency_contacts.append(contact)
+        self._changed()
     
     def add_certification(self,
                          name: str,
@@ -189,6 +196,7 @@ class Psychologist(User):
             "expiry_date": expiry_date
         }
         self.certifications.append(certification)
+        self._changed()
     
     def get_active_patients(self) -> List[Dict[str, Union[str, datetime, Dict]]]:
         """
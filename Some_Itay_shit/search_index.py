@@ -0,0 +1,265 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+import heapq
+import math
+import re
+import threading
+from events import room_topic, dm_topic
+
+K1 = 1.2  # BM25 term-frequency saturation
+B = 0.75  # BM25 length normalization
+MAX_PREFIX_EXPANSIONS = 64  # vocabulary terms a prefix query may expand to
+PREFIX_WEIGHT = 0.5  # score weight of prefix completions relative to exact matches
+
+HEBREW_MARKS = re.compile("[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")  # niqqud and cantillation
+HEBREW_ACRONYM_QUOTES = re.compile("(?<=[\u05D0-\u05EA])[\"'\u05F3\u05F4]+(?=[\u05D0-\u05EA])")  # geresh/gershayim in acronyms
+FINAL_LETTERS = str.maketrans("\u05DA\u05DD\u05DF\u05E3\u05E5", "\u05DB\u05DE\u05E0\u05E4\u05E6")  # final forms -> regular
+QUERY_TERM = re.compile(r"(\w+)(\*)?")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize Hebrew/English text for matching
+
+    Strips niqqud and cantillation marks, joins acronym quotes (geresh,
+    gershayim), maps final letter forms to their regular forms and casefolds.
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Normalized text
+    """
+    text = HEBREW_MARKS.sub("", text)
+    text = HEBREW_ACRONYM_QUOTES.sub("", text)
+    return text.casefold().translate(FINAL_LETTERS)
+
+def normalize_with_offsets(text: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    Normalize text like normalize_text, keeping track of where each character came from
+
+    Args:
+        text: Text to normalize
+
+    Returns:
+        Normalized text and, for each of its characters, the index of the
+        original character (None when the two line up one to one)
+    """
+    folded = text.casefold().translate(FINAL_LETTERS)
+    if len(folded) == len(text) and not HEBREW_MARKS.search(text) and not HEBREW_ACRONYM_QUOTES.search(text):
+        return folded, None
+
+    skipped = {position for match in HEBREW_ACRONYM_QUOTES.finditer(text)
+               for position in range(match.start(), match.end())}
+    characters = []
+    offsets = []
+    for position, character in enumerate(text):
+        if position in skipped or HEBREW_MARKS.match(character):
+            continue
+        for normalized in character.casefold().translate(FINAL_LETTERS):
+            characters.append(normalized)
+            offsets.append(position)
+    return "".join(characters), offsets
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into normalized word tokens
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return re.findall(r"\w+", normalize_text(text))
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    Split a search query into terms
+
+    A term followed by * matches as a prefix, and so does the last term while
+    it is still being typed (no trailing whitespace).
+
+    Args:
+        query: Raw query
+
+    Returns:
+        Unique (term, is_prefix) pairs in query order
+    """
+    query = normalize_text(query)
+    terms: Dict[str, bool] = {}
+    for match in QUERY_TERM.finditer(query):
+        is_prefix = bool(match.group(2)) or match.end() == len(query)
+        terms[match.group(1)] = terms.get(match.group(1), False) or is_prefix
+    return list(terms.items())
+
+class SearchIndex:
+    """
+    Incrementally maintained inverted index over chat messages
+
+    Every message belongs to a scope (the event-bus topic of its room or
+    conversation), which searches filter on. Messages are referenced rather
+    than copied; edits re-index the message in place.
+    """
+
+    def __init__(self):
+        """Initialize an empty index"""
+        self._docs: Dict[int, Tuple[Hashable, Any]] = {}  # doc -> (scope, message)
+        self._doc_ids: Dict[str, int] = {}  # message_id -> doc
+        self._doc_terms: Dict[int, Dict[str, int]] = {}  # doc -> {term: frequency}
+        self._lengths: Dict[int, int] = {}  # doc -> number of tokens
+        self._postings: Dict[str, Dict[int, int]] = {}  # term -> {doc: frequency}
+        self._vocabulary: List[str] = []  # sorted terms, for prefix expansion
+        self._total_length = 0
+        self._next_doc = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _index_terms(self, doc: int, content: str) -> None:
+        """Add a document's terms to the postings"""
+        frequencies: Dict[str, int] = {}
+        for term in tokenize(content):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        self._doc_terms[doc] = frequencies
+        self._lengths[doc] = sum(frequencies.values())
+        self._total_length += self._lengths[doc]
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            postings[doc] = frequency
+
+    def _unindex_terms(self, doc: int) -> None:
+        """Remove a document's terms from the postings"""
+        frequencies = self._doc_terms.pop(doc)
+        self._total_length -= self._lengths.pop(doc)
+        for term in frequencies:
+            postings = self._postings[term]
+            del postings[doc]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def add(self, scope: Hashable, message: Any) -> None:
+        """
+        Index a message
+
+        Args:
+            scope: Topic of the message's room or conversation
+            message: Message with message_id and content
+        """
+        with self._lock:
+            if message["message_id"] in self._doc_ids:
+                return
+            doc = self._next_doc
+            self._next_doc += 1
+            self._docs[doc] = (scope, message)
+            self._doc_ids[message["message_id"]] = doc
+            self._index_terms(doc, message["content"])
+
+    def update(self, message_id: str, content: str) -> None:
+        """
+        Re-index an edited message
+
+        Args:
+            message_id: ID of the message
+            content: New content
+        """
+        with self._lock:
+            doc = self._doc_ids.get(message_id)
+            if doc is not None:
+                self._unindex_terms(doc)
+                self._index_terms(doc, content)
+
+    def remove(self, message_id: str) -> None:
+        """
+        Drop a deleted message
+
+        Args:
+            message_id: ID of the message
+        """
+        with self._lock:
+            doc = self._doc_ids.pop(message_id, None)
+            if doc is not None:
+                self._unindex_terms(doc)
+                del self._docs[doc]
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        """
+        Keep the index current from chat events (subscribe to ALL_EVENTS)
+
+        Args:
+            event: Mutation record published on the event bus
+        """
+        op = event["op"]
+        if op == "add_message":
+            self.add(room_topic(event["room_id"]), event["message"])
+        elif op == "edit_message":
+            self.update(event["message_id"], event["content"])
+        elif op == "delete_message":
+            self.remove(event["message_id"])
+        elif op == "send_direct_message":
+            self.add(dm_topic(event["sender_id"], event["recipient_id"]), event["message"])
+
+    def _expand(self, term: str, is_prefix: bool) -> List[Tuple[str, float]]:
+        """Get the indexed terms a query term matches, with their score weights"""
+        if not is_prefix:
+            return [(term, 1.0)] if term in self._postings else []
+        expansions = []
+        for position in range(bisect_left(self._vocabulary, term), len(self._vocabulary)):
+            candidate = self._vocabulary[position]
+            if not candidate.startswith(term) or len(expansions) == MAX_PREFIX_EXPANSIONS:
+                break
+            expansions.append((candidate, 1.0 if candidate == term else PREFIX_WEIGHT))
+        return expansions
+
+    def search(self,
+               query: str,
+               scopes: Set[Hashable],
+               limit: int = 20) -> List[Tuple[Hashable, Any, float]]:
+        """
+        Find the messages matching every query term, best first
+
+        Args:
+            query: Search query (see parse_query)
+            scopes: Scopes the searching user may read
+            limit: Maximum number of results
+
+        Returns:
+            List of (scope, message, score) tuples
+        """
+        with self._lock:
+            terms = [self._expand(term, is_prefix) for term, is_prefix in parse_query(query)]
+            if not terms or not scopes or not all(terms):
+                return []
+
+            # Intersect starting from the rarest term to keep candidate sets small
+            terms.sort(key=lambda expansions: sum(len(self._postings[term]) for term, _ in expansions))
+            doc_count = len(self._docs)
+            average_length = self._total_length / doc_count
+            scores: Optional[Dict[int, float]] = None
+            for expansions in terms:
+                term_scores: Dict[int, float] = {}
+                for term, weight in expansions:
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    if scores is None:
+                        matches = ((doc, frequency) for doc, frequency in postings.items()
+                                   if self._docs[doc][0] in scopes)
+                    elif len(scores) < len(postings):
+                        matches = ((doc, postings[doc]) for doc in scores if doc in postings)
+                    else:
+                        matches = ((doc, frequency) for doc, frequency in postings.items() if doc in scores)
+                    for doc, frequency in matches:
+                        norm = K1 * (1 - B + B * self._lengths[doc] / average_length)
+                        term_scores[doc] = term_scores.get(doc, 0.0) + weight * idf * frequency * (K1 + 1) / (frequency + norm)
+                scores = term_scores if scores is None else {doc: score + term_scores[doc]
+                                                             for doc, score in scores.items() if doc in term_scores}
+                if not scores:
+                    return []
+
+            # Later documents win ties, so recent messages rank first among equals
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+            return [(*self._docs[doc], score) for doc, score in best]
@@ -0,0 +1,89 @@
+from typing import Callable, Dict, List
+import threading
+import time
+
+SLOW_MODE_BURST = 1  # messages a user may send back to back before waiting
+SWEEP_INTERVAL = 60.0  # seconds between sweeps of idle users' buckets
+
+class SlowModeLimiter:
+    """
+    Per-user token buckets of one room's slow mode
+
+    A bucket holds up to SLOW_MODE_BURST messages and refills one message
+    per interval, so checks are O(1). A user idle long enough to refill is
+    indistinguishable from a new one, so such buckets are swept away
+    periodically instead of accumulating.
+    """
+
+    def __init__(self, burst: int = SLOW_MODE_BURST, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the limiter
+
+        Args:
+            burst: Bucket capacity in messages
+            clock: Monotonic time source (seconds)
+        """
+        self.burst = burst
+        self.clock = clock
+        self._buckets: Dict[str, List[float]] = {}  # user_id -> [tokens, last update]
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def allow(self, user_id: str, interval: float) -> bool:
+        """
+        Spend a message from a user's bucket if one is available
+
+        Args:
+            user_id: ID of the sending user
+            interval: Seconds for one message to refill (0 or less means no limit)
+
+        Returns:
+            True if the user may send now
+        """
+        if interval <= 0:
+            return True
+        with self._lock:
+            now = self.clock()
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._sweep(now, interval)
+
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                self._buckets[user_id] = [self.burst - 1, now]
+                return True
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) / interval)
+            bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def retry_after(self, user_id: str, interval: float) -> float:
+        """
+        Get how long a user has to wait before the next message
+
+        Args:
+            user_id: ID of the user
+            interval: Seconds for one message to refill (0 or less means no limit)
+
+        Returns:
+            Seconds to wait (0 if the user may send now)
+        """
+        if interval <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                return 0.0
+            tokens = bucket[0] + (self.clock() - bucket[1]) / interval
+            return max(0.0, (1 - tokens) * interval)
+
+    def _sweep(self, now: float, interval: float) -> None:
+        """Drop the buckets of users who have been idle long enough to refill"""
+        refill_time = self.burst * interval
+        self._buckets = {user_id: bucket for user_id, bucket in self._buckets.items()
+                         if now - bucket[1] < refill_time}
+        self._last_sweep = now
@@ -1,6 +1,6 @@
 from typing import Dict, List, Optional, Union
 from datetime import datetime
-from .user import User, UserType, CombatRole
+from user import User, UserType, CombatRole
 
 class Soldier(User):
     """Class representing a soldier in the system"""
@@ -62,6 +62,7 @@ class Soldier(User):
             "description": description
         }
         self.deployments.append(deployment)
+        self._changed()
     
     def add_training_record(self,
                           training_type: str,
@@ -87,6 +88,7 @@ class Soldier(User):
             "notes": notes
         }
         self.training_records.append(record)
+        self._changed()
     
     def add_medical_record(self,
                           record_type: str,
@@ -115,6 +117,7 @@ class Soldier(User):
             "notes": notes
         }
         self.medical_records.append(record)
+        self._changed()
     
     def add_emergency_contact(self,
                             name: str,
@@ -140,6 +143,7 @@ class Soldier(User):
             "address": address
         }
         self.emergency_contacts.append(contact)
+        self._changed()
     
     def get_active_deployment(self) -> Optional[Dict[str, Union[str, datetime]]]:
         """
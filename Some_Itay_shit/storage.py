@@ -0,0 +1,914 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+from chat_log import ChatLog, json_default
+
+COMPACTION_THRESHOLD = 1000  # log records that trigger an early compaction
+COMPACTION_INTERVAL = 300  # seconds between periodic compactions
+
+# Operations that change a room's message history rather than its metadata
+ROOM_MESSAGE_OPS = frozenset(("add_message", "edit_message", "delete_message", "add_reaction", "remove_reaction"))
+
+def _fsync_directory(directory: str) -> None:
+    """Make a rename inside a directory durable (not supported on every platform)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _find_message(messages: List[Dict[str, Any]], message_id: str) -> Optional[Dict[str, Any]]:
+    """Find a message by ID in a list of serialized messages"""
+    for message in messages:
+        if message["message_id"] == message_id:
+            return message
+    return None
+
+def conversation_key(user1_id: str, user2_id: str) -> str:
+    """
+    Get the key of the direct-message conversation between two users
+    
+    Args:
+        user1_id: ID of one participant
+        user2_id: ID of the other participant
+        
+    Returns:
+        Key built from the ordered user pair (the same for both argument orders)
+    """
+    first, second = sorted((user1_id, user2_id))
+    return f"{first}|{second}"
+
+def add_conversation(state: Dict[str, Any], user1_id: str, user2_id: str) -> List[Dict[str, Any]]:
+    """
+    Get a conversation's message list, registering it in both users' indexes if new
+    
+    Args:
+        state: Chat state with conversations and user_conversations
+        user1_id: ID of one participant
+        user2_id: ID of the other participant
+        
+    Returns:
+        The conversation's message list
+    """
+    key = conversation_key(user1_id, user2_id)
+    if key not in state["conversations"]:
+        state["conversations"][key] = []
+        state["user_conversations"].setdefault(user1_id, {})[user2_id] = key
+        state["user_conversations"].setdefault(user2_id, {})[user1_id] = key
+    return state["conversations"][key]
+
+def migrate_direct_messages(state: Dict[str, Any]) -> None:
+    """
+    Convert the legacy per-user direct_messages layout (every message stored
+    twice) into one conversation per user pair
+    
+    Args:
+        state: Chat state, converted in place
+    """
+    state.setdefault("conversations", {})
+    state.setdefault("user_conversations", {})
+    for user_id, peers in state.pop("direct_messages", {}).items():
+        for other_user_id, messages in peers.items():
+            key = conversation_key(user_id, other_user_id)
+            if key not in state["conversations"]:
+                add_conversation(state, user_id, other_user_id).extend(messages)
+                continue
+            # Second copy: the two copies only ever diverged in their read flags
+            by_id = {message["message_id"]: message for message in state["conversations"][key]}
+            for message in messages:
+                if message["message_id"] in by_id:
+                    by_id[message["message_id"]]["read"] = by_id[message["message_id"]]["read"] or message["read"]
+
+def apply_record(state: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """
+    Fold a single log record into serialized chat state
+    
+    Args:
+        state: Snapshot dictionary with rooms, user_rooms, conversations and user_conversations
+        record: Operation record read from the chat log
+    """
+    op = record["op"]
+    rooms = state["rooms"]
+    room = rooms.get(record.get("room_id"))
+    
+    if op == "create_room":
+        room_data = record["room"]
+        rooms[room_data["room_id"]] = room_data
+        user_room_ids = state["user_rooms"].setdefault(room_data["created_by"], [])
+        if room_data["room_id"] not in user_room_ids:
+            user_room_ids.append(room_data["room_id"])
+    elif op == "join_room":
+        user_room_ids = state["user_rooms"].setdefault(record["user_id"], [])
+        if record["room_id"] not in user_room_ids:
+            user_room_ids.append(record["room_id"])
+        if room and record["user_id"] not in room["participants"]:
+            room["participants"].append(record["user_id"])
+    elif op == "leave_room":
+        user_room_ids = state["user_rooms"].get(record["user_id"], [])
+        if record["room_id"] in user_room_ids:
+            user_room_ids.remove(record["room_id"])
+        if not user_room_ids:
+            state["user_rooms"].pop(record["user_id"], None)
+        if room:
+            for key in ("participants", "moderators"):
+                if record["user_id"] in room[key]:
+                    room[key].remove(record["user_id"])
+    elif op == "send_direct_message":
+        add_conversation(state, record["sender_id"], record["recipient_id"]).append(record["message"])
+    elif op == "mark_messages_read":
+        messages = state["conversations"].get(conversation_key(record["user_id"], record["other_user_id"]), [])
+        read_positions = state.setdefault("read_positions", {}).setdefault(record["user_id"], {})
+        start = read_positions.get(record["other_user_id"], 0)
+        end = record.get("position", len(messages))  # records written before watermarks cover everything
+        for position in range(min(start, end), min(end, len(messages))):
+            if messages[position]["sender_id"] == record["other_user_id"]:
+                messages[position]["read"] = True
+        read_positions[record["other_user_id"]] = max(start, end)
+    elif room is None:
+        return
+    elif op == "add_message":
+        room["messages"].append(record["message"])
+    elif op == "edit_message":
+        message = _find_message(room["messages"], record["message_id"])
+        if message:
+            message["content"] = record["content"]
+            message["edited"] = True
+            message["edited_by"] = record["edited_by"]
+            message["edited_at"] = record["edited_at"]
+    elif op == "delete_message":
+        room["messages"] = [m for m in room["messages"] if m["message_id"] != record["message_id"]]
+    elif op == "add_reaction":
+        message = _find_message(room["messages"], record["message_id"])
+        if message:
+            reactions = message["reactions"].setdefault(record["user_id"], [])
+            if record["reaction"] not in reactions:
+                reactions.append(record["reaction"])
+    elif op == "remove_reaction":
+        message = _find_message(room["messages"], record["message_id"])
+        if message and record["reaction"] in message["reactions"].get(record["user_id"], []):
+            message["reactions"][record["user_id"]].remove(record["reaction"])
+            if not message["reactions"][record["user_id"]]:
+                del message["reactions"][record["user_id"]]
+    elif op == "pin_message":
+        if record["message_id"] not in room["pinned_messages"]:
+            room["pinned_messages"].append(record["message_id"])
+    elif op == "unpin_message":
+        if record["message_id"] in room["pinned_messages"]:
+            room["pinned_messages"].remove(record["message_id"])
+    elif op == "add_moderator":
+        if record["user_id"] not in room["moderators"]:
+            room["moderators"].append(record["user_id"])
+    elif op == "remove_moderator":
+        if record["user_id"] in room["moderators"]:
+            room["moderators"].remove(record["user_id"])
+    elif op == "update_settings":
+        room["settings"].update(record["settings"])
+
+# Bulky user fields stored apart from the profile, so loading a user for
+# display never parses them (see UserRepository)
+USER_RECORD_FIELDS = (
+    "notifications",
+    "deployments",
+    "training_records",
+    "medical_records",
+    "medical_conditions",
+    "notes",
+    "support_requests",
+    "patient_history",
+    "session_notes"
+)
+
+def split_user(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Split a serialized user into its profile and its record fields
+    
+    Args:
+        data: Output of User.to_dict()
+        
+    Returns:
+        (profile, records) dictionaries
+    """
+    profile = {key: value for key, value in data.items() if key not in USER_RECORD_FIELDS}
+    records = {key: value for key, value in data.items() if key in USER_RECORD_FIELDS}
+    return profile, records
+
+class StorageBackend:
+    """Interface of the persistence engines behind ChatManager and User"""
+    
+    def load_state(self) -> Dict[str, Any]:
+        """
+        Load the persisted chat state
+        
+        Returns:
+            Dictionary with serialized rooms, user_rooms, conversations,
+            user_conversations and (optionally) read_positions. Rooms may
+            come without "messages"; their history is then read with
+            load_room_messages.
+        """
+        raise NotImplementedError
+    
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Persist a single mutation record (see apply_record for the format)
+        
+        Args:
+            record: Operation record
+            
+        Returns:
+            Sequence number of the record
+        """
+        raise NotImplementedError
+    
+    def compact(self) -> None:
+        """Reorganize stored data; a no-op for engines that never need it"""
+    
+    def load_room_messages(self, room_id: str) -> List[Dict[str, Any]]:
+        """
+        Load the message history of a room, for engines whose load_state
+        leaves room messages out
+        
+        Args:
+            room_id: ID of the room
+            
+        Returns:
+            Serialized messages in chronological order
+        """
+        raise NotImplementedError
+    
+    def save_user(self, data: Dict[str, Any]) -> None:
+        """
+        Persist a serialized user
+        
+        Args:
+            data: Output of User.to_dict()
+        """
+        raise NotImplementedError
+    
+    def save_users(self, users: List[Dict[str, Any]]) -> None:
+        """
+        Persist several serialized users at once
+        
+        Args:
+            users: Outputs of User.to_dict()
+        """
+        for data in users:
+            self.save_user(data)
+    
+    def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a serialized user
+        
+        Args:
+            user_id: ID of the user to load
+            
+        Returns:
+            User dictionary if found, None otherwise
+        """
+        raise NotImplementedError
+    
+    def load_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a serialized user without its record fields
+        
+        Args:
+            user_id: ID of the user to load
+            
+        Returns:
+            Profile dictionary if found, None otherwise
+        """
+        data = self.load_user(user_id)
+        return split_user(data)[0] if data else None
+    
+    def load_user_records(self, user_id: str) -> Dict[str, Any]:
+        """
+        Load only the record fields of a serialized user
+        
+        Args:
+            user_id: ID of the user
+            
+        Returns:
+            Dictionary of the stored record fields (empty if none)
+        """
+        data = self.load_user(user_id)
+        return split_user(data)[1] if data else {}
+    
+    def close(self) -> None:
+        """Flush pending writes and release resources"""
+
+class JsonStorage(StorageBackend):
+    """
+    JSON snapshot + append-only operation log, compacted in the background
+    
+    The snapshot holds everything but room histories, which are kept in one
+    file per room (rooms/<room_id>.json) and read only when a room is opened.
+    Each history file records the sequence number it is current to, so log
+    records are never applied to it twice.
+    """
+    
+    def __init__(self,
+                 data_dir: str = "data",
+                 compaction_threshold: int = COMPACTION_THRESHOLD,
+                 compaction_interval: float = COMPACTION_INTERVAL):
+        """
+        Initialize the JSON storage
+        
+        Args:
+            data_dir: Directory holding the snapshot, the operation log and user files
+            compaction_threshold: Number of log records that triggers a compaction
+            compaction_interval: Seconds between periodic compactions
+        """
+        self.data_dir = data_dir
+        self.compaction_threshold = compaction_threshold
+        self.compaction_interval = compaction_interval
+        self.log: Optional[ChatLog] = None
+        self._snapshot_seq = 0
+        self._room_tails: Dict[str, List[Dict[str, Any]]] = {}  # room_id -> log records not yet in its history file
+        self._compaction_lock = threading.Lock()
+        self._compaction_requested = threading.Event()
+        self._closed = False
+        self._compactor: Optional[threading.Thread] = None
+    
+    def load_state(self) -> Dict[str, Any]:
+        """
+        Load the latest snapshot and replay the operation log over it
+        
+        Room histories stay on disk (see load_room_messages); log records
+        that change them are held back until the room is loaded. Rooms
+        created since the last compaction come with their messages.
+        
+        Returns:
+            Dictionary with serialized rooms, user_rooms, conversations,
+            user_conversations and read_positions
+        """
+        state = self._read_snapshot()
+        if any("messages" in room for room in state["rooms"].values()):
+            # Snapshots written before histories were split out
+            self._write_snapshot(state)
+        # Records replayed below are not in the snapshot yet and count toward the next compaction
+        self._snapshot_seq = state["seq"]
+        
+        log_path = os.path.join(self.data_dir, "chat.log")
+        self._room_tails = {}
+        for path in (log_path + ".1", log_path):
+            for record in ChatLog.read_records(path, state["seq"]):
+                room = state["rooms"].get(record.get("room_id"))
+                if record["op"] in ROOM_MESSAGE_OPS and room is not None and "messages" not in room:
+                    self._room_tails.setdefault(record["room_id"], []).append(record)
+                else:
+                    apply_record(state, record)
+                state["seq"] = record["seq"]
+        
+        if state["seq"] - self._snapshot_seq >= self.compaction_threshold:
+            self._compaction_requested.set()
+        if self.log is None:
+            self.log = ChatLog(log_path, start_seq=state["seq"])
+            self._compactor = threading.Thread(target=self._compaction_loop, daemon=True)
+            self._compactor.start()
+        return state
+    
+    def load_room_messages(self, room_id: str) -> List[Dict[str, Any]]:
+        """
+        Load the message history of a room from its file, replaying the log records held back by load_state
+        
+        Args:
+            room_id: ID of the room
+            
+        Returns:
+            Serialized messages in chronological order
+        """
+        history = self._read_room_history(room_id)
+        state = {"rooms": {room_id: history}}
+        for record in self._room_tails.pop(room_id, ()):
+            # A compaction since load_state may already have folded the record in
+            if record["seq"] > history["seq"]:
+                apply_record(state, record)
+        return history["messages"]
+    
+    def _room_path(self, room_id: str) -> str:
+        """Get the path of a room's history file"""
+        return os.path.join(self.data_dir, "rooms", f"{room_id}.json")
+    
+    def _read_room_history(self, room_id: str) -> Dict[str, Any]:
+        """
+        Read a room's history file
+        
+        Returns:
+            Dictionary with the seq the history is current to and its messages
+        """
+        return self._read_json(self._room_path(room_id)) or {"seq": 0, "messages": []}
+    
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Append a mutation record to the log, requesting a compaction when the tail grows long
+        
+        Args:
+            record: Operation record
+            
+        Returns:
+            Sequence number of the record
+        """
+        seq = self.log.append(record)
+        if seq - self._snapshot_seq >= self.compaction_threshold:
+            self._compaction_requested.set()
+        return seq
+    
+    def compact(self) -> None:
+        """
+        Fold accumulated log records into a new snapshot
+        
+        The active log is rotated aside first so new mutations keep flowing
+        while the snapshot is rebuilt from disk. The new snapshot replaces the
+        old one atomically and the rotated log is removed only afterwards;
+        records it still holds are skipped on replay by sequence number, so a
+        crash at any point leaves a recoverable snapshot + log pair.
+        """
+        with self._compaction_lock:
+            rotated_path = self.log.path + ".1"
+            if not os.path.exists(rotated_path):
+                # A leftover rotated log from an interrupted compaction is folded first
+                self.log.rotate(rotated_path)
+            
+            state = self._read_snapshot()
+            history_seqs: Dict[str, int] = {}  # room_id -> seq of the history file read
+            for record in ChatLog.read_records(rotated_path, state["seq"]):
+                room = state["rooms"].get(record.get("room_id"))
+                if record["op"] in ROOM_MESSAGE_OPS and room is not None and "messages" not in room:
+                    # Only the histories the log touches are read and rewritten
+                    history = self._read_room_history(record["room_id"])
+                    room["messages"] = history["messages"]
+                    history_seqs[record["room_id"]] = history["seq"]
+                if record["op"] not in ROOM_MESSAGE_OPS or record["seq"] > history_seqs.get(record["room_id"], 0):
+                    apply_record(state, record)
+                state["seq"] = record["seq"]
+            
+            self._write_snapshot(state)
+            os.remove(rotated_path)
+            self._snapshot_seq = state["seq"]
+    
+    def _write_snapshot(self, state: Dict[str, Any]) -> None:
+        """
+        Move the room histories held in a state out to their files, then write the snapshot
+        
+        Histories go first: one written ahead of a crash is current to a
+        later seq than the snapshot, and replay skips what it already holds.
+        
+        Args:
+            state: Snapshot dictionary; rooms lose their "messages"
+        """
+        os.makedirs(os.path.join(self.data_dir, "rooms"), exist_ok=True)
+        for room_id, room in state["rooms"].items():
+            if "messages" in room:
+                self._write_atomic(self._room_path(room_id), {"seq": state["seq"], "messages": room.pop("messages")})
+        self._write_atomic(os.path.join(self.data_dir, "snapshot.json"), state)
+    
+    def _write_atomic(self, path: str, data: Any) -> None:
+        """
+        Replace a JSON file atomically via temp file + rename
+        
+        Args:
+            path: Destination path
+            data: JSON-serializable data
+        """
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        _fsync_directory(os.path.dirname(path) or ".")
+    
+    def _compaction_loop(self) -> None:
+        """Background loop compacting the log periodically or when it grows long"""
+        while True:
+            self._compaction_requested.wait(self.compaction_interval)
+            self._compaction_requested.clear()
+            if self._closed:
+                return
+            if self.log.seq > self._snapshot_seq:
+                try:
+                    self.compact()
+                except Exception as e:
+                    # The log keeps every record, so the next attempt loses nothing
+                    print(f"Chat log compaction failed: {e}")
+    
+    def _read_snapshot(self) -> Dict[str, Any]:
+        """
+        Read the latest snapshot, falling back to the legacy per-collection files
+        
+        Returns:
+            Snapshot dictionary with seq, rooms, user_rooms, conversations and user_conversations
+        """
+        try:
+            with open(os.path.join(self.data_dir, "snapshot.json"), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {"seq": 0}
+            for key in ("rooms", "user_rooms", "direct_messages"):
+                try:
+                    with open(os.path.join(self.data_dir, f"{key}.json"), 'r', encoding='utf-8') as f:
+                        state[key] = json.load(f)
+                except FileNotFoundError:
+                    state[key] = {}
+        
+        if "conversations" not in state:
+            migrate_direct_messages(state)
+        return state
+    
+    def save_user(self, data: Dict[str, Any]) -> None:
+        """
+        Persist a serialized user: the profile and the record fields go to separate JSON files
+        
+        Args:
+            data: Output of User.to_dict()
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        profile, records = split_user(data)
+        self._write_atomic(os.path.join(self.data_dir, f"user_{data['user_id']}_records.json"), records)
+        self._write_atomic(os.path.join(self.data_dir, f"user_{data['user_id']}.json"), profile)
+    
+    def _read_json(self, path: str) -> Optional[Any]:
+        """Read a JSON file, or None if it is missing or unreadable"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a serialized user from its JSON files
+        
+        Args:
+            user_id: ID of the user to load
+            
+        Returns:
+            User dictionary if found, None otherwise
+        """
+        data = self._read_json(os.path.join(self.data_dir, f"user_{user_id}.json"))
+        if data is None:
+            return None
+        data.update(self._read_json(os.path.join(self.data_dir, f"user_{user_id}_records.json")) or {})
+        return data
+    
+    def load_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a serialized user's profile file
+        
+        Args:
+            user_id: ID of the user to load
+            
+        Returns:
+            Profile dictionary if found, None otherwise
+        """
+        data = self._read_json(os.path.join(self.data_dir, f"user_{user_id}.json"))
+        # Files written before the split still carry the record fields
+        return split_user(data)[0] if data else None
+    
+    def load_user_records(self, user_id: str) -> Dict[str, Any]:
+        """
+        Load a serialized user's record fields
+        
+        Args:
+            user_id: ID of the user
+            
+        Returns:
+            Dictionary of the stored record fields (empty if none)
+        """
+        records = self._read_json(os.path.join(self.data_dir, f"user_{user_id}_records.json"))
+        if records is None:
+            return super().load_user_records(user_id)
+        return records
+    
+    def close(self) -> None:
+        """Stop background compaction, flush pending log records and release the log file"""
+        self._closed = True
+        self._compaction_requested.set()
+        if self._compactor:
+            self._compactor.join()
+        if self.log:
+            self.log.close()
+
+class SQLiteStorage(StorageBackend):
+    """SQLite database in WAL mode with indexed rooms, messages and users"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rooms (
+            room_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS room_messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id TEXT NOT NULL UNIQUE,
+            room_id TEXT NOT NULL,
+            sender_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_room_messages_room ON room_messages (room_id, seq);
+        CREATE INDEX IF NOT EXISTS idx_room_messages_sender ON room_messages (sender_id);
+        CREATE INDEX IF NOT EXISTS idx_room_messages_timestamp ON room_messages (room_id, timestamp);
+        CREATE TABLE IF NOT EXISTS user_rooms (
+            user_id TEXT NOT NULL,
+            room_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, room_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_user_rooms_room ON user_rooms (room_id);
+        CREATE TABLE IF NOT EXISTS direct_messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id TEXT NOT NULL UNIQUE,
+            sender_id TEXT NOT NULL,
+            recipient_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            read INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_direct_messages_pair ON direct_messages (sender_id, recipient_id, seq);
+        CREATE INDEX IF NOT EXISTS idx_direct_messages_recipient ON direct_messages (recipient_id, read);
+        CREATE INDEX IF NOT EXISTS idx_direct_messages_timestamp ON direct_messages (timestamp);
+        CREATE TABLE IF NOT EXISTS read_positions (
+            user_id TEXT NOT NULL,
+            other_user_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (user_id, other_user_id)
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            user_type TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS user_records (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+    
+    # Statements are kept as constants so sqlite3's statement cache reuses the prepared plans
+    INSERT_ROOM = "INSERT OR REPLACE INTO rooms (room_id, data) VALUES (?, ?)"
+    SELECT_ROOM = "SELECT data FROM rooms WHERE room_id = ?"
+    UPDATE_ROOM = "UPDATE rooms SET data = ? WHERE room_id = ?"
+    INSERT_USER_ROOM = "INSERT OR IGNORE INTO user_rooms (user_id, room_id) VALUES (?, ?)"
+    DELETE_USER_ROOM = "DELETE FROM user_rooms WHERE user_id = ? AND room_id = ?"
+    INSERT_ROOM_MESSAGE = ("INSERT OR IGNORE INTO room_messages (message_id, room_id, sender_id, timestamp, data) "
+                           "VALUES (?, ?, ?, ?, ?)")
+    SELECT_ROOM_MESSAGE = "SELECT data FROM room_messages WHERE message_id = ?"
+    SELECT_ROOM_MESSAGES = "SELECT data FROM room_messages WHERE room_id = ? ORDER BY seq"
+    UPDATE_ROOM_MESSAGE = "UPDATE room_messages SET data = ? WHERE message_id = ?"
+    DELETE_ROOM_MESSAGE = "DELETE FROM room_messages WHERE message_id = ?"
+    INSERT_DIRECT_MESSAGE = ("INSERT OR IGNORE INTO direct_messages (message_id, sender_id, recipient_id, timestamp, data) "
+                             "VALUES (?, ?, ?, ?, ?)")
+    CONVERSATION = "((sender_id = :user AND recipient_id = :other) OR (sender_id = :other AND recipient_id = :user))"
+    COUNT_CONVERSATION = "SELECT COUNT(*) FROM direct_messages WHERE " + CONVERSATION
+    MARK_READ = ("UPDATE direct_messages SET read = 1 WHERE sender_id = :other AND recipient_id = :user AND read = 0 "
+                 "AND seq IN (SELECT seq FROM direct_messages WHERE " + CONVERSATION + " ORDER BY seq LIMIT :position)")
+    UPSERT_READ_POSITION = ("INSERT INTO read_positions (user_id, other_user_id, position) VALUES (:user, :other, :position) "
+                            "ON CONFLICT (user_id, other_user_id) DO UPDATE SET position = MAX(position, excluded.position)")
+    INSERT_USER = "INSERT OR REPLACE INTO users (user_id, user_type, data) VALUES (?, ?, ?)"
+    SELECT_USER = "SELECT data FROM users WHERE user_id = ?"
+    INSERT_USER_RECORDS = "INSERT OR REPLACE INTO user_records (user_id, data) VALUES (?, ?)"
+    SELECT_USER_RECORDS = "SELECT data FROM user_records WHERE user_id = ?"
+    
+    def __init__(self, path: str = os.path.join("data", "chat.db")):
+        """
+        Open (or create) the database
+        
+        Args:
+            path: Path of the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+    
+    def load_state(self) -> Dict[str, Any]:
+        """
+        Load the persisted chat state
+        
+        Returns:
+            Dictionary with serialized rooms (metadata only, see
+            load_room_messages), user_rooms, conversations,
+            user_conversations and read_positions
+        """
+        with self._lock:
+            rooms = {room_id: json.loads(data)
+                     for room_id, data in self.connection.execute("SELECT room_id, data FROM rooms")}
+            
+            user_rooms: Dict[str, List[str]] = {}
+            for user_id, room_id in self.connection.execute("SELECT user_id, room_id FROM user_rooms"):
+                user_rooms.setdefault(user_id, []).append(room_id)
+            
+            state: Dict[str, Any] = {"conversations": {}, "user_conversations": {}}
+            query = "SELECT sender_id, recipient_id, read, data FROM direct_messages ORDER BY seq"
+            for sender_id, recipient_id, read, data in self.connection.execute(query):
+                message = json.loads(data)
+                message["read"] = bool(read)
+                add_conversation(state, sender_id, recipient_id).append(message)
+            
+            read_positions: Dict[str, Dict[str, int]] = {}
+            for user_id, other_user_id, position in self.connection.execute("SELECT * FROM read_positions"):
+                read_positions.setdefault(user_id, {})[other_user_id] = position
+        
+        return {
+            "rooms": rooms,
+            "user_rooms": user_rooms,
+            "conversations": state["conversations"],
+            "user_conversations": state["user_conversations"],
+            "read_positions": read_positions
+        }
+    
+    def load_room_messages(self, room_id: str) -> List[Dict[str, Any]]:
+        """
+        Load the message history of a room
+        
+        Args:
+            room_id: ID of the room
+            
+        Returns:
+            Serialized messages in chronological order
+        """
+        with self._lock:
+            return [json.loads(data) for data, in self.connection.execute(self.SELECT_ROOM_MESSAGES, (room_id,))]
+    
+    def append(self, record: Dict[str, Any]) -> int:
+        """
+        Apply a mutation record as a single transaction
+        
+        Args:
+            record: Operation record
+            
+        Returns:
+            Sequence number of the record (per connection)
+        """
+        with self._lock, self.connection:
+            self._apply(record)
+            self._seq += 1
+            return self._seq
+    
+    def _dumps(self, data: Any) -> str:
+        """Serialize data for a TEXT column"""
+        return json.dumps(data, ensure_ascii=False, default=json_default)
+    
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """
+        Translate a mutation record into SQL statements
+        
+        Args:
+            record: Operation record
+        """
+        op = record["op"]
+        db = self.connection
+        
+        if op == "create_room":
+            room_data = dict(record["room"])
+            messages = room_data.pop("messages", [])
+            db.execute(self.INSERT_ROOM, (room_data["room_id"], self._dumps(room_data)))
+            db.execute(self.INSERT_USER_ROOM, (room_data["created_by"], room_data["room_id"]))
+            for message in messages:
+                self._insert_room_message(room_data["room_id"], message)
+        elif op == "join_room":
+            db.execute(self.INSERT_USER_ROOM, (record["user_id"], record["room_id"]))
+            self._update_room(record)
+        elif op == "leave_room":
+            db.execute(self.DELETE_USER_ROOM, (record["user_id"], record["room_id"]))
+            self._update_room(record)
+        elif op == "send_direct_message":
+            message = record["message"]
+            db.execute(self.INSERT_DIRECT_MESSAGE, (message["message_id"],
+                                                    record["sender_id"],
+                                                    record["recipient_id"],
+                                                    json_default(message["timestamp"]),
+                                                    self._dumps(message)))
+        elif op == "mark_messages_read":
+            # Only messages below the record's watermark were read, as in JsonStorage
+            params = {"user": record["user_id"], "other": record["other_user_id"], "position": record.get("position")}
+            if params["position"] is None:  # records written before watermarks cover everything
+                params["position"] = db.execute(self.COUNT_CONVERSATION, params).fetchone()[0]
+            db.execute(self.MARK_READ, params)
+            db.execute(self.UPSERT_READ_POSITION, params)
+        elif op == "add_message":
+            self._insert_room_message(record["room_id"], record["message"])
+        elif op == "delete_message":
+            db.execute(self.DELETE_ROOM_MESSAGE, (record["message_id"],))
+        elif op in ("edit_message", "add_reaction", "remove_reaction"):
+            row = db.execute(self.SELECT_ROOM_MESSAGE, (record["message_id"],)).fetchone()
+            if row:
+                # Reuse the generic fold on a one-message room
+                room = {"messages": [json.loads(row[0])]}
+                apply_record({"rooms": {record["room_id"]: room}}, record)
+                db.execute(self.UPDATE_ROOM_MESSAGE, (self._dumps(room["messages"][0]), record["message_id"]))
+        else:
+            self._update_room(record)
+    
+    def _insert_room_message(self, room_id: str, message: Dict[str, Any]) -> None:
+        """Insert a serialized room message"""
+        self.connection.execute(self.INSERT_ROOM_MESSAGE, (message["message_id"],
+                                                           room_id,
+                                                           message["sender_id"],
+                                                           json_default(message["timestamp"]),
+                                                           self._dumps(message)))
+    
+    def _update_room(self, record: Dict[str, Any]) -> None:
+        """Fold a record touching room metadata (participants, pins, settings...) into the rooms table"""
+        row = self.connection.execute(self.SELECT_ROOM, (record["room_id"],)).fetchone()
+        if not row:
+            return
+        room = json.loads(row[0])
+        room["messages"] = []
+        state = {"rooms": {record["room_id"]: room}, "user_rooms": {}}
+        apply_record(state, record)
+        del room["messages"]
+        self.connection.execute(self.UPDATE_ROOM, (self._dumps(room), record["room_id"]))
+    
+    def save_user(self, data: Dict[str, Any]) -> None:
+        """
+        Persist a serialized user
+        
+        Args:
+            data: Output of User.to_dict()
+        """
+        self.save_users([data])
+    
+    def save_users(self, users: List[Dict[str, Any]]) -> None:
+        """
+        Persist several serialized users in one transaction
+        
+        Args:
+            users: Outputs of User.to_dict()
+        """
+        profiles = []
+        records = []
+        for data in users:
+            profile, user_records = split_user(data)
+            profiles.append((data["user_id"], data["user_type"], self._dumps(profile)))
+            records.append((data["user_id"], self._dumps(user_records)))
+        with self._lock, self.connection:
+            self.connection.executemany(self.INSERT_USER, profiles)
+            self.connection.executemany(self.INSERT_USER_RECORDS, records)
+    
+    def load_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a serialized user
+        
+        Args:
+            user_id: ID of the user to load
+            
+        Returns:
+            User dictionary if found, None otherwise
+        """
+        with self._lock:
+            row = self.connection.execute(self.SELECT_USER, (user_id,)).fetchone()
+            records = self.connection.execute(self.SELECT_USER_RECORDS, (user_id,)).fetchone()
+        if not row:
+            return None
+        data = json.loads(row[0])
+        if records:
+            data.update(json.loads(records[0]))
+        return data
+    
+    def load_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a serialized user without its record fields
+        
+        Args:
+            user_id: ID of the user to load
+            
+        Returns:
+            Profile dictionary if found, None otherwise
+        """
+        with self._lock:
+            row = self.connection.execute(self.SELECT_USER, (user_id,)).fetchone()
+        # Rows written before the split still carry the record fields
+        return split_user(json.loads(row[0]))[0] if row else None
+    
+    def load_user_records(self, user_id: str) -> Dict[str, Any]:
+        """
+        Load only the record fields of a serialized user
+        
+        Args:
+            user_id: ID of the user
+            
+        Returns:
+            Dictionary of the stored record fields (empty if none)
+        """
+        with self._lock:
+            row = self.connection.execute(self.SELECT_USER_RECORDS, (user_id,)).fetchone()
+        if row is None:
+            return super().load_user_records(user_id)
+        return json.loads(row[0])
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self.connection.close()
@@ -1,8 +1,9 @@
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 from datetime import datetime
 import json
 import os
+from storage import StorageBackend, USER_RECORD_FIELDS
 
 class UserType(Enum):
     """Enum representing different types of users in the system"""
@@ -44,6 +45,7 @@ class User:
             email: Optional email address
             profile_image: Optional path to profile image
         """
+        self._on_change: Optional[Callable[['User'], None]] = None  # set by track_changes
         self.user_id = user_id
         self.first_name = first_name
         self.last_name = last_name
@@ -57,6 +59,55 @@ class User:
         self.preferences: Dict[str, Union[str, bool, List[str]]] = {}
         self.notifications: List[Dict[str, Union[str, datetime, bool]]] = []
     
+    def defer_records(self, loader: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Drop the record fields (USER_RECORD_FIELDS) until they are first accessed
+        
+        Args:
+            loader: Function returning the stored record fields
+        """
+        self._deferred_records = {field: self.__dict__.pop(field)
+                                  for field in USER_RECORD_FIELDS if field in self.__dict__}
+        self._records_loader = loader
+    
+    @property
+    def records_loaded(self) -> bool:
+        """Whether the record fields are in memory"""
+        return self.__dict__.get("_records_loader") is None
+    
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for missing attributes, i.e. record fields deferred by defer_records
+        loader = self.__dict__.get("_records_loader")
+        if loader is None or name not in self.__dict__.get("_deferred_records", {}):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        records = loader()
+        for field, default in self._deferred_records.items():
+            self.__dict__[field] = records.get(field, default)  # loading is not a change
+        self._records_loader = None
+        return getattr(self, name)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        # Public attributes are persisted; private ones are bookkeeping
+        if not name.startswith("_"):
+            self._changed()
+    
+    def track_changes(self, on_change: Optional[Callable[['User'], None]]) -> None:
+        """
+        Report every later change of this user
+        
+        Args:
+            on_change: Function called with the user after each change
+                (e.g. UserRepository.mark_dirty), or None to stop reporting
+        """
+        self._on_change = on_change
+    
+    def _changed(self) -> None:
+        """Report a change to the tracker set by track_changes, if any"""
+        on_change = self.__dict__.get("_on_change")
+        if on_change is not None:
+            on_change(self)
+    
     @property
     def full_name(self) -> str:
         """Get the user's full name"""
@@ -98,6 +149,7 @@ class User:
             value: Preference value
         """
         self.preferences[key] = value
+        self._changed()
     
     def get_preference(self, key: str, default: any = None) -> any:
         """
@@ -130,6 +182,7 @@ class User:
             "timestamp": datetime.now(),
             "is_read": is_read
         })
+        self._changed()
     
     def mark_notification_read(self, index: int) -> None:
         """
@@ -140,6 +193,7 @@ class User:
         """
         if 0 <= index < len(self.notifications):
             self.notifications[index]["is_read"] = True
+        self._changed()
     
     def get_unread_notifications(self) -> List[Dict[str, Union[str, datetime, bool]]]:
         """
@@ -202,13 +256,18 @@ class User:
         
         return user
     
-    def save_to_file(self, directory: str = "data") -> None:
+    def save_to_file(self, directory: str = "data", storage: Optional[StorageBackend] = None) -> None:
         """
-        Save user data to a JSON file
+        Save user data to a JSON file, or to a storage engine if one is given
         
         Args:
             directory: Directory to save the file in
+            storage: Optional storage engine to save to instead
         """
+        if storage:
+            storage.save_user(self.to_dict())
+            return
+        
         os.makedirs(directory, exist_ok=True)
         file_path = os.path.join(directory, f"user_{self.user_id}.json")
         
@@ -216,17 +275,25 @@ class User:
             json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
     
     @classmethod
-    def load_from_file(cls, user_id: str, directory: str = "data") -> Optional['User']:
+    def load_from_file(cls,
+                       user_id: str,
+                       directory: str = "data",
+                       storage: Optional[StorageBackend] = None) -> Optional['User']:
         """
-        Load user data from a JSON file
+        Load user data from a JSON file, or from a storage engine if one is given
         
         Args:
             user_id: ID of the user to load
             directory: Directory containing the user file
+            storage: Optional storage engine to load from instead
             
         Returns:
             User instance if found, None otherwise
         """
+        if storage:
+            data = storage.load_user(user_id)
+            return cls.from_dict(data) if data else None
+        
         file_path = os.path.join(directory, f"user_{user_id}.json")
         
         try:
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+import threading
+from storage import StorageBackend, JsonStorage, USER_RECORD_FIELDS
+from user import User, UserType
+from soldier import Soldier
+from evacuee import Evacuee
+from psychologist import Psychologist
+
+USER_CACHE_SIZE = 256  # hydrated users kept in memory
+WRITE_BATCH_SIZE = 32  # dirty users that trigger a write-back
+
+USER_CLASSES = {
+    UserType.SOLDIER.value: Soldier,
+    UserType.EVACUEE.value: Evacuee,
+    UserType.PSYCHOLOGIST.value: Psychologist
+}
+
+class UserRepository:
+    """
+    Bounded cache of hydrated users in front of a storage engine
+
+    Users are built from their profile only; record fields (medical records,
+    session notes, notifications, ...) are loaded on first access. Cached
+    users report their own changes (see User.track_changes), are marked
+    dirty and written back in batches.
+    """
+
+    def __init__(self,
+                 storage: Optional[StorageBackend] = None,
+                 capacity: int = USER_CACHE_SIZE,
+                 write_batch_size: int = WRITE_BATCH_SIZE):
+        """
+        Initialize the repository
+
+        Args:
+            storage: Storage engine holding the users (JSON files by default)
+            capacity: Maximum number of cached users
+            write_batch_size: Number of dirty users that triggers a write-back
+        """
+        self.storage = storage or JsonStorage()
+        self.capacity = capacity
+        self.write_batch_size = write_batch_size
+        self._users: "OrderedDict[str, User]" = OrderedDict()  # least recently used first
+        self._dirty: Dict[str, User] = {}
+        self._lock = threading.RLock()
+
+    def _hydrate(self, profile: Dict) -> User:
+        """
+        Build a user object from a stored profile, deferring its record fields
+
+        Args:
+            profile: Serialized user without record fields
+
+        Returns:
+            User instance of the matching class
+        """
+        data = dict(profile)
+        for field in USER_RECORD_FIELDS:
+            data.setdefault(field, [])
+        user = USER_CLASSES.get(data["user_type"], User).from_dict(data)
+        user.defer_records(lambda: self.storage.load_user_records(profile["user_id"]))
+        user.track_changes(self.mark_dirty)
+        return user
+
+    def _cache(self, user: User) -> None:
+        """Insert a user as most recently used, evicting the least recently used if full"""
+        self._users[user.user_id] = user
+        self._users.move_to_end(user.user_id)
+        while len(self._users) > self.capacity:
+            user_id, _ = self._users.popitem(last=False)
+            # Dirty users must reach storage before they can be dropped
+            if user_id in self._dirty:
+                self.flush()
+
+    def get(self, user_id: str) -> Optional[User]:
+        """
+        Get a user by ID
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            User instance if found, None otherwise
+        """
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None:
+                self._users.move_to_end(user_id)
+                return user
+            profile = self.storage.load_user_profile(user_id)
+            if profile is None:
+                return None
+            user = self._hydrate(profile)
+            self._cache(user)
+            return user
+
+    def get_many(self, user_ids: Iterable[str]) -> List[User]:
+        """
+        Get several users (e.g. a room's participants), skipping unknown IDs
+
+        Args:
+            user_ids: IDs of the users
+
+        Returns:
+            Found users in the order of user_ids
+        """
+        users = (self.get(user_id) for user_id in user_ids)
+        return [user for user in users if user is not None]
+
+    def add(self, user: User) -> None:
+        """
+        Add a new or externally built user and schedule it for saving
+
+        Args:
+            user: User to add
+        """
+        with self._lock:
+            self._cache(user)
+            user.track_changes(self.mark_dirty)
+            self.mark_dirty(user)
+
+    def adopt(self, user: User) -> None:
+        """
+        Make an externally built user (e.g. the one logging in) the cached
+        instance, so changes made through it are tracked and saved
+        
+        Stored record fields stay authoritative: the adopted user loads them
+        on first access instead of keeping its own.
+        
+        Args:
+            user: User to adopt
+        """
+        with self._lock:
+            cached = self._users.get(user.user_id)
+            if cached is user:
+                return
+            if cached is not None:
+                cached.track_changes(None)
+            if user.user_id in self._dirty:
+                self.flush()  # storage must hold the pending changes the adopted user will load
+            if self.storage.load_user_profile(user.user_id) is None:
+                self.add(user)
+                return
+            user.defer_records(lambda: self.storage.load_user_records(user.user_id))
+            self._cache(user)
+            user.track_changes(self.mark_dirty)
+    
+    def mark_dirty(self, user: User) -> None:
+        """
+        Schedule a changed user for write-back
+
+        Args:
+            user: Changed user
+        """
+        with self._lock:
+            self._dirty[user.user_id] = user
+            if len(self._dirty) >= self.write_batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write every dirty user back to storage in one batch"""
+        with self._lock:
+            if not self._dirty:
+                return
+            users = list(self._dirty.values())
+            self._dirty.clear()
+            self.storage.save_users([user.to_dict() for user in users])
+
+    def close(self) -> None:
+        """Write back pending changes"""
+        self.flush()
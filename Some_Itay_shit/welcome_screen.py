@@ -1,27 +1,42 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 import json
 import os
 from datetime import datetime
+from chat_log import ChatLog
 from user import User, UserType
 from soldier import Soldier, CombatRole
 from evacuee import Evacuee
 from psychologist import Psychologist
 
+# User type as chosen in the UI -> key of its list in users.json
+USER_TYPE_KEYS = {
+    "soldier": "soldiers",
+    "evacuee": "evacuees",
+    "psychologist": "psychologists"
+}
+
+USERS_COMPACTION_THRESHOLD = 500  # logged registrations folded into users.json on startup
+
 class WelcomeScreen:
     """Welcome screen for the support chat application"""
     
-    def __init__(self, root: tk.Tk, on_login: callable):
+    def __init__(self,
+                 root: tk.Tk,
+                 on_login: callable,
+                 on_register: Optional[Callable[[str, Dict], None]] = None):
         """
         Initialize the welcome screen
         
         Args:
             root: Root window
             on_login: Callback function for successful login
+            on_register: Optional callback with the users.json key and record of each new user
         """
         self.root = root
         self.on_login = on_login
+        self.on_register = on_register
         
         # Configure window
         self.root.title("Support Chat - Welcome")
@@ -46,8 +61,14 @@ class WelcomeScreen:
         self.main_frame.grid_columnconfigure(0, weight=1)
     
     def load_users_from_file(self) -> None:
-        """Load user data from JSON file"""
+        """
+        Load user data and build the per-type ID index
+        
+        users.json is the base snapshot; registrations since then are replayed
+        from the users.log append-only log.
+        """
         users_file = os.path.join(os.path.dirname(__file__), "users.json")
+        log_file = os.path.join(os.path.dirname(__file__), "users.log")
         try:
             with open(users_file, "r") as f:
                 self.users = json.load(f)
@@ -107,13 +128,36 @@ class WelcomeScreen:
                     }
                 ]
             }
+        
+        # Index records by ID; lists saved under the UI's singular type names are merged in
+        self.user_index: Dict[str, Dict[str, Dict]] = {key: {} for key in USER_TYPE_KEYS.values()}
+        for key, records in self.users.items():
+            for record in records:
+                self.user_index.setdefault(USER_TYPE_KEYS.get(key, key), {})[record["id"]] = record
+        
+        logged = 0
+        for record in ChatLog.read_records(log_file):
+            self.user_index.setdefault(record["user_type"], {})[record["user"]["id"]] = record["user"]
+            logged += 1
+        
+        # Fold a long log, a fresh default database or singular-keyed lists into users.json
+        migrated = any(key not in self.user_index for key in self.users)
+        if logged >= USERS_COMPACTION_THRESHOLD or migrated or not os.path.exists(users_file):
             self.save_users_to_file()
+            if os.path.exists(log_file):
+                os.remove(log_file)
+        self.user_log = ChatLog(log_file)
     
     def save_users_to_file(self) -> None:
-        """Save user data to JSON file"""
+        """Save user data to JSON file atomically"""
         users_file = os.path.join(os.path.dirname(__file__), "users.json")
-        with open(users_file, "w") as f:
+        self.users = {key: list(records.values()) for key, records in self.user_index.items()}
+        temp_file = users_file + ".tmp"
+        with open(temp_file, "w") as f:
             json.dump(self.users, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, users_file)
     
     def create_header(self) -> None:
         """Create the header section"""
@@ -224,10 +268,9 @@ class WelcomeScreen:
             return
         
         # Find user in database
-        user_list = self.users.get(user_type, [])
-        user = next((u for u in user_list if u["id"] == user_id and u["first_name"] == first_name), None)
+        user = self.user_index.get(USER_TYPE_KEYS.get(user_type, user_type), {}).get(user_id)
         
-        if not user:
+        if not user or user["first_name"] != first_name:
             messagebox.showerror("Error", "Invalid credentials")
             return
         
@@ -273,8 +316,8 @@ class WelcomeScreen:
             return
         
         # Check if user already exists
-        user_list = self.users.get(user_type, [])
-        if any(u["id"] == user_id for u in user_list):
+        type_key = USER_TYPE_KEYS.get(user_type, user_type)
+        if user_id in self.user_index.get(type_key, {}):
             messagebox.showerror("Error", "User ID already exists")
             return
         
@@ -305,12 +348,13 @@ class WelcomeScreen:
             })
         
         # Add to database
-        if user_type not in self.users:
-            self.users[user_type] = []
-        self.users[user_type].append(new_user)
+        self.user_index.setdefault(type_key, {})[user_id] = new_user
         
-        # Save to file
-        self.save_users_to_file()
+        # Append to the registration log instead of rewriting users.json
+        self.user_log.append({"op": "register_user", "user_type": type_key, "user": new_user})
+        self.user_log.flush()
+        if self.on_register:
+            self.on_register(type_key, new_user)
         
         messagebox.showinfo("Success", "Registration successful")
         
@@ -326,4 +370,8 @@ class WelcomeScreen:
     
     def hide(self) -> None:
         """Hide the welcome screen"""
-        self.main_frame.grid_remove() 
\ No newline at end of file
+        self.main_frame.grid_remove()
+    
+    def close(self) -> None:
+        """Flush and release the registration log"""
+        self.user_log.close() 
\ No newline at end of file
@@ -0,0 +1,122 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+import re
+from search_index import HEBREW_MARKS, normalize_text, normalize_with_offsets
+
+CENSOR_CHARACTER = "*"
+WORD_CHARACTER = re.compile(r"\w")
+
+class MutedWordFilter:
+    """
+    Aho-Corasick matcher over a room's muted words
+
+    The automaton is compiled once per word list and scans a message in a
+    single pass, however many words are muted. Words and messages are
+    normalized the same way as for search (niqqud, final letters, case), and
+    matches are reported in positions of the original text. Only whole words
+    match: "ass" mutes "ass" but not "class" or "passed".
+    """
+
+    def __init__(self, words: Iterable[str]):
+        """
+        Compile the automaton
+
+        Args:
+            words: Muted words or phrases
+        """
+        self._transitions: List[Dict[str, int]] = [{}]  # state -> {character: next state}
+        self._fail: List[int] = [0]  # state -> longest proper suffix state
+        self._match_lengths: List[Tuple[int, ...]] = [()]  # state -> lengths of the words ending there, longest first
+
+        for word in words:
+            word = normalize_text(word).strip()
+            if not word:
+                continue
+            state = 0
+            for character in word:
+                next_state = self._transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][character] = next_state
+                    self._transitions.append({})
+                    self._fail.append(0)
+                    self._match_lengths.append(())
+                state = next_state
+            self._match_lengths[state] = (len(word),)
+
+        # Breadth-first, so every suffix state is finished before it is used
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._transitions[state].items():
+                fail = self._fail[state]
+                while fail and character not in self._transitions[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._transitions[fail].get(character, 0)
+                # Words ending at the suffix state end here too, and are shorter
+                self._match_lengths[next_state] += self._match_lengths[self._fail[next_state]]
+                queue.append(next_state)
+
+    def __bool__(self) -> bool:
+        return len(self._transitions) > 1
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Find muted words in a text
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Non-overlapping (start, end) spans of the original text, in order
+        """
+        normalized, offsets = normalize_with_offsets(text)
+        spans: List[Tuple[int, int]] = []
+        state = 0
+        for position, character in enumerate(normalized):
+            while state and character not in self._transitions[state]:
+                state = self._fail[state]
+            state = self._transitions[state].get(character, 0)
+            if not self._match_lengths[state]:
+                continue
+            if position + 1 < len(normalized) and WORD_CHARACTER.match(normalized[position + 1]):
+                continue  # the match ends inside a word
+            for length in self._match_lengths[state]:
+                start = position - length + 1
+                if not start or not WORD_CHARACTER.match(normalized[start - 1]):
+                    break
+            else:
+                continue  # every match starts inside a word
+            if offsets is not None:
+                start, end = offsets[start], offsets[position] + 1
+                while end < len(text) and HEBREW_MARKS.match(text[end]):  # niqqud of the last letter
+                    end += 1
+            else:
+                end = position + 1
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (min(spans[-1][0], start), end)
+            else:
+                spans.append((start, end))
+        return spans
+
+    def censor(self, text: str) -> str:
+        """
+        Mask muted words in a text
+
+        Args:
+            text: Text to censor
+
+        Returns:
+            The text with every muted word replaced by CENSOR_CHARACTER
+        """
+        spans = self.find(text)
+        if not spans:
+            return text
+        pieces = []
+        previous_end = 0
+        for start, end in spans:
+            pieces.append(text[previous_end:start])
+            pieces.append(CENSOR_CHARACTER * (end - start))
+            previous_end = end
+        pieces.append(text[previous_end:])
+        return "".join(pieces)
@@ -0,0 +1,271 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
+import json
+
+import httpx
+
+Messages = List[Dict[str, str]]
+
+class AIBackend:
+    """
+    Interface of a chat-completions provider
+
+    Options are passed through to the provider (temperature, top_p,
+    penalties, ...). Errors are the provider's own; is_retryable tells the
+    caller which of them are transient.
+    """
+
+    def complete(self, messages: Messages, **options: Any) -> str:
+        """
+        Get a whole reply
+
+        Args:
+            messages: Chat messages (role/content dictionaries)
+            **options: Generation options
+
+        Returns:
+            Reply text
+        """
+        raise NotImplementedError
+
+    def stream(self, messages: Messages, **options: Any) -> Iterator[str]:
+        """
+        Get a reply piece by piece
+
+        Args:
+            messages: Chat messages
+            **options: Generation options
+
+        Returns:
+            Iterator over reply pieces
+        """
+        raise NotImplementedError
+
+    async def complete_async(self, messages: Messages, **options: Any) -> str:
+        """
+        Get a whole reply without blocking the event loop
+
+        Args:
+            messages: Chat messages
+            **options: Generation options
+
+        Returns:
+            Reply text
+        """
+        raise NotImplementedError
+
+    async def open_stream_async(self, messages: Messages, **options: Any) -> AsyncIterator[str]:
+        """
+        Start a streamed reply
+
+        Failures to start (rate limits, connection errors) are raised here,
+        before any piece is produced, so the call can be retried as a whole.
+
+        Args:
+            messages: Chat messages
+            **options: Generation options
+
+        Returns:
+            Async iterator over reply pieces
+        """
+        raise NotImplementedError
+
+    async def warm_up_async(self) -> None:
+        """Create clients and open a connection ahead of the first request"""
+
+    def is_retryable(self, error: Exception) -> bool:
+        """
+        Whether an error is transient (rate limit, connection, server error)
+
+        Args:
+            error: Error raised by one of the calls
+
+        Returns:
+            True if the call is worth retrying
+        """
+        return False
+
+class GroqBackend(AIBackend):
+    """Groq cloud backend (clients are created on first use)"""
+
+    def __init__(self, api_key: str, model: str, max_connections: int = 8):
+        """
+        Initialize the backend
+
+        Args:
+            api_key: Groq API key
+            model: Model name
+            max_connections: Size of the async connection pool
+        """
+        self.api_key = api_key
+        self.model = model
+        self.max_connections = max_connections
+        self._client = None
+        self._async_client = None
+        self._async_loop = None
+
+    @property
+    def client(self):
+        """Synchronous Groq client"""
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=self.api_key)
+        return self._client
+
+    def async_client(self):
+        """Async Groq client pooled for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            from groq import AsyncGroq
+            http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=self.max_connections,
+                                                                max_keepalive_connections=self.max_connections))
+            # Retries are done by the caller, against its own quotas
+            self._async_client = AsyncGroq(api_key=self.api_key, http_client=http_client, max_retries=0)
+            self._async_loop = loop
+        return self._async_client
+
+    def complete(self, messages: Messages, **options: Any) -> str:
+        chat_completion = self.client.chat.completions.create(messages=messages,
+                                                              model=self.model,
+                                                              stream=False,
+                                                              **options)
+        return chat_completion.choices[0].message.content
+
+    def stream(self, messages: Messages, **options: Any) -> Iterator[str]:
+        stream = self.client.chat.completions.create(messages=messages,
+                                                     model=self.model,
+                                                     stream=True,
+                                                     **options)
+        for chunk in stream:
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    async def complete_async(self, messages: Messages, **options: Any) -> str:
+        chat_completion = await self.async_client().chat.completions.create(messages=messages,
+                                                                            model=self.model,
+                                                                            stream=False,
+                                                                            **options)
+        return chat_completion.choices[0].message.content
+
+    async def open_stream_async(self, messages: Messages, **options: Any) -> AsyncIterator[str]:
+        stream = await self.async_client().chat.completions.create(messages=messages,
+                                                                   model=self.model,
+                                                                   stream=True,
+                                                                   **options)
+
+        async def pieces() -> AsyncIterator[str]:
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+
+        return pieces()
+
+    async def warm_up_async(self) -> None:
+        # Listing models is free and leaves a pooled TLS connection behind
+        await self.async_client().models.list()
+
+    def is_retryable(self, error: Exception) -> bool:
+        from groq import APIConnectionError, InternalServerError, RateLimitError
+        return isinstance(error, (RateLimitError, APIConnectionError, InternalServerError))
+
+class OpenAICompatibleBackend(AIBackend):
+    """Backend for any OpenAI-compatible chat-completions endpoint (e.g. the fake server)"""
+
+    def __init__(self,
+                 base_url: str,
+                 model: str,
+                 api_key: str = "",
+                 max_connections: int = 8,
+                 timeout: float = 60.0):
+        """
+        Initialize the backend
+
+        Args:
+            base_url: URL that /chat/completions is appended to
+            model: Model name
+            api_key: Optional bearer token
+            max_connections: Size of the connection pools
+            timeout: Request timeout in seconds
+        """
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.timeout = timeout
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+
+    @property
+    def client(self) -> httpx.Client:
+        """Synchronous pooled HTTP client"""
+        if self._client is None:
+            self._client = httpx.Client(limits=self.limits, timeout=self.timeout, headers=self.headers)
+        return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Async pooled HTTP client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, headers=self.headers)
+            self._async_loop = loop
+        return self._async_client
+
+    def _body(self, messages: Messages, stream: bool, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a request body"""
+        return {"model": self.model, "messages": messages, "stream": stream, **options}
+
+    @staticmethod
+    def _stream_piece(line: str) -> Optional[str]:
+        """Extract the text of a server-sent event line, if any"""
+        if not line.startswith("data: ") or line == "data: [DONE]":
+            return None
+        return json.loads(line[len("data: "):])["choices"][0]["delta"].get("content")
+
+    def complete(self, messages: Messages, **options: Any) -> str:
+        response = self.client.post(self.url, json=self._body(messages, False, options))
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stream(self, messages: Messages, **options: Any) -> Iterator[str]:
+        with self.client.stream("POST", self.url, json=self._body(messages, True, options)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                piece = self._stream_piece(line)
+                if piece:
+                    yield piece
+
+    async def complete_async(self, messages: Messages, **options: Any) -> str:
+        response = await self.async_client().post(self.url, json=self._body(messages, False, options))
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def open_stream_async(self, messages: Messages, **options: Any) -> AsyncIterator[str]:
+        client = self.async_client()
+        request = client.build_request("POST", self.url, json=self._body(messages, True, options))
+        response = await client.send(request, stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            response.raise_for_status()
+
+        async def pieces() -> AsyncIterator[str]:
+            try:
+                async for line in response.aiter_lines():
+                    piece = self._stream_piece(line)
+                    if piece:
+                        yield piece
+            finally:
+                await response.aclose()
+
+        return pieces()
+
+    async def warm_up_async(self) -> None:
+        self.async_client()
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
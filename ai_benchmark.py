@@ -0,0 +1,128 @@
+from typing import Dict, List
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import AI
+from ai_backends import OpenAICompatibleBackend
+from ai_limits import TokenBucket
+from ai_memory import MemoryStore, format_turn
+from fake_ai_server import FakeChatServer
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Get a nearest-rank percentile
+
+    Args:
+        values: Samples
+        fraction: Percentile as a fraction (0.95 for p95)
+
+    Returns:
+        The percentile value
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+def make_memory(directory: str, turns: int) -> MemoryStore:
+    """
+    Create a memory transcript with the given number of synthetic exchanges
+
+    Args:
+        directory: Directory for the transcript file
+        turns: Number of exchanges
+
+    Returns:
+        Memory store loaded from the transcript
+    """
+    path = os.path.join(directory, f"memory_{turns}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n")
+        for i in range(turns):
+            f.write(format_turn(f"question {i} about topic {i % 37} and place {i % 11}",
+                                f"answer {i} explaining topic {i % 37} in a few sentences"))
+    return MemoryStore(path)
+
+async def run_level(requests: int, concurrency: int, stream: bool) -> Dict[str, float]:
+    """
+    Send requests through AI's async path with a fixed number in flight
+
+    Args:
+        requests: Number of requests
+        concurrency: Requests in flight at once
+        stream: Use the streaming path and also measure time to first token
+
+    Returns:
+        Latency percentiles (seconds) and throughput (requests per second)
+    """
+    in_flight = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+
+    async def one(i: int) -> None:
+        async with in_flight:
+            start = time.perf_counter()
+            if stream:
+                first = None
+                async for _ in AI.stream_to_AI_async(f"benchmark question {i} about topic {i % 37}", fresh=True):
+                    if first is None:
+                        first = time.perf_counter() - start
+                first_tokens.append(first)
+            else:
+                await AI.send_to_AI_async(f"benchmark question {i} about topic {i % 37}", fresh=True)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "throughput": requests / elapsed
+    }
+    if stream:
+        result["ttft_p50"] = percentile(first_tokens, 0.50)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI client against the fake chat-completions server")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--memory-turns", default="0,500,5000", help="comma-separated memory sizes in exchanges")
+    parser.add_argument("--stream", action="store_true", help="benchmark the streaming path")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake time to first token (seconds)")
+    parser.add_argument("--token-interval", type=float, default=0.005)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests the fake answers with 429")
+    parser.add_argument("--quota", action="store_true", help="keep AI's provider quotas instead of lifting them")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    server = FakeChatServer(first_token_latency=args.latency,
+                            token_interval=args.token_interval,
+                            rate_limit_probability=args.rate_limit,
+                            retry_after=0.05).start()
+    AI.set_backend(OpenAICompatibleBackend(server.base_url, AI.MODEL, max_connections=max(levels)))
+    AI.MAX_CONCURRENT_REQUESTS = max(levels)
+    if not args.quota:
+        AI.request_bucket = TokenBucket(1e9, 1e9)
+        AI.token_bucket = TokenBucket(1e9, 1e9)
+
+    print(f"{'memory':>7} {'conc':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}"
+          + (f" {'ttft ms':>8}" if args.stream else "") + f" {'429s':>5}")
+    with tempfile.TemporaryDirectory() as directory:
+        for turns in (int(turns) for turns in args.memory_turns.split(",")):
+            AI.memory_store = make_memory(directory, turns)
+            for level in levels:
+                rate_limited = server.rate_limited
+                result = asyncio.run(run_level(args.requests, level, args.stream))
+                print(f"{turns:>7} {level:>5} {result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} "
+                      f"{result['p99'] * 1000:>8.1f} {result['throughput']:>7.1f}"
+                      + (f" {result['ttft_p50'] * 1000:>8.1f}" if args.stream else "")
+                      + f" {server.rate_limited - rate_limited:>5}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
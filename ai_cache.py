@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+MAX_ENTRIES = 512
+TTL = 6 * 60 * 60  # seconds a cached answer stays valid
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s.!?,;:~]+$")
+
+def normalize_message(message: str) -> str:
+    """
+    Normalize a user message so trivially different phrasings share a cache entry
+
+    Args:
+        message: Raw user message
+
+    Returns:
+        Casefolded message with collapsed whitespace and no trailing punctuation
+    """
+    return _TRAILING.sub("", _SPACES.sub(" ", message.casefold().strip()))
+
+class ResponseCache:
+    """
+    LRU + TTL cache of AI answers, persisted to disk
+
+    Entries are keyed on the normalized user message plus a digest of the
+    memory the answer was based on, so a changed memory never serves a
+    stale answer.
+    """
+
+    def __init__(self,
+                 path: Optional[str] = "ai_cache.json",
+                 max_entries: int = MAX_ENTRIES,
+                 ttl: float = TTL):
+        """
+        Open a response cache
+
+        Args:
+            path: JSON file the cache is persisted to (None keeps it in memory only)
+            max_entries: Maximum number of cached answers
+            ttl: Seconds an answer stays valid
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (answer, expiry), oldest use first
+        self._lock = threading.Lock()
+
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                entries = []
+            now = time.time()
+            for key, answer, expires_at in entries[-max_entries:]:
+                if expires_at > now:
+                    self._entries[key] = (answer, expires_at)
+
+    @staticmethod
+    def make_key(message: str, memory_digest: str) -> str:
+        """
+        Build the cache key of a request
+
+        Args:
+            message: User message
+            memory_digest: Digest of the memory the answer depends on
+
+        Returns:
+            Cache key
+        """
+        return hashlib.sha256((normalize_message(message) + "\0" + memory_digest).encode("utf-8")).hexdigest()
+
+    def get(self, message: str, memory_digest: str) -> Optional[str]:
+        """
+        Look up a cached answer
+
+        Args:
+            message: User message
+            memory_digest: Digest of the active memory
+
+        Returns:
+            Cached answer, or None on a miss
+        """
+        key = self.make_key(message, memory_digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, message: str, memory_digest: str, answer: str) -> None:
+        """
+        Cache an answer, evicting the least recently used entries if full
+
+        Args:
+            message: User message
+            memory_digest: Digest of the memory the answer was based on
+            answer: AI answer
+        """
+        key = self.make_key(message, memory_digest)
+        with self._lock:
+            self._entries[key] = (answer, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def _save(self) -> None:
+        """Write the cache to disk atomically (caller holds the lock)"""
+        if not self.path:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump([[key, answer, expires_at] for key, (answer, expires_at) in self._entries.items()],
+                      f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def stats(self) -> dict:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, misses, hit rate and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries)
+            }
@@ -0,0 +1,101 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import random
+import time
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.5  # seconds before the first retry (upper bound of its jitter)
+MAX_DELAY = 20.0
+
+class TokenBucket:
+    """
+    Asyncio token bucket matching a provider quota
+
+    Acquiring reserves tokens right away, letting the balance go negative,
+    and then sleeps off the deficit, so concurrent callers queue in order
+    without a lock (there is no await between the check and the update).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate: Tokens refilled per second
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, quota: float) -> "TokenBucket":
+        """
+        Create a bucket for a per-minute quota (requests or tokens per minute)
+
+        Args:
+            quota: Allowed amount per minute
+
+        Returns:
+            Bucket allowing the whole quota as a burst
+        """
+        return cls(quota / 60.0, quota)
+
+    async def acquire(self, amount: float = 1) -> None:
+        """
+        Wait until amount tokens may be spent, and spend them
+
+        Args:
+            amount: Number of tokens needed
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+def backoff_delay(attempt: int, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY) -> float:
+    """
+    Get a full-jitter exponential backoff delay
+
+    Args:
+        attempt: Number of failed attempts so far (1 for the first retry)
+        base_delay: Delay bound of the first retry
+        max_delay: Upper bound of any delay
+
+    Returns:
+        Seconds to wait
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+async def retry_with_backoff(call: Callable[[], Awaitable[T]],
+                             retryable: Callable[[Exception], bool],
+                             attempts: int = MAX_ATTEMPTS,
+                             retry_after: Optional[Callable[[Exception], Optional[float]]] = None) -> T:
+    """
+    Run an async call, retrying transient failures with jittered backoff
+
+    Args:
+        call: Function starting the attempt
+        retryable: Whether an error is worth retrying
+        attempts: Maximum number of attempts
+        retry_after: Optional function reading a server-requested delay from an error
+
+    Returns:
+        Result of the first successful attempt
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == attempts or not retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            requested = retry_after(e) if retry_after else None
+            if requested is not None:
+                delay = max(delay, requested)
+            await asyncio.sleep(delay)
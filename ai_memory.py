@@ -0,0 +1,318 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+
+RECENT_TURNS = 6  # most recent exchanges always sent verbatim
+TOP_K = 4  # older exchanges retrieved per call
+TOKEN_BUDGET = 1200  # approximate tokens of memory per prompt
+SUMMARY_BATCH = 20  # older exchanges folded into the summary per compaction
+SUMMARY_CHARS = 1200  # length kept by the local stub summarizer
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+_TURN = re.compile(r"\nUser: (.*?)\nYou: (.*?)(?=\nUser: |\Z)", re.S)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word terms (works for Hebrew and English)
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of terms
+    """
+    return _WORD.findall(text.casefold())
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate how many model tokens a text costs
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count (about four characters per token)
+    """
+    return len(text) // 4 + 1
+
+def format_turn(user_message: str, reply: str) -> str:
+    """
+    Format an exchange the way it is stored in the memory file
+
+    Args:
+        user_message: What the user said
+        reply: What the AI answered
+
+    Returns:
+        Transcript text of the exchange
+    """
+    return "\nUser: " + user_message + "\nYou: " + reply
+
+def parse_turns(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a memory transcript into (user message, reply) exchanges
+
+    Args:
+        text: Transcript in the memory file format
+
+    Returns:
+        Exchanges in chronological order
+    """
+    return [(user_message, reply) for user_message, reply in _TURN.findall(text)]
+
+# (previous summary, exchanges to fold in) -> new summary
+Summarizer = Callable[[str, List[Tuple[str, str]]], str]
+
+def truncating_summarizer(summary: str, turns: List[Tuple[str, str]]) -> str:
+    """
+    Local summarizer that needs no model: keeps the start of each user message
+
+    Stands in for a model-backed summarizer in tests and offline runs.
+
+    Args:
+        summary: Summary of everything before turns
+        turns: Exchanges to fold into the summary
+
+    Returns:
+        New summary, at most SUMMARY_CHARS long
+    """
+    notes = [summary] if summary else []
+    notes.extend("- User: " + user_message.strip()[:80] for user_message, _ in turns)
+    return "\n".join(notes)[-SUMMARY_CHARS:]
+
+class BM25Index:
+    """Incremental BM25 index over exchange texts"""
+
+    def __init__(self):
+        """Initialize an empty index"""
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {doc id -> term frequency}
+        self.lengths: Dict[int, int] = {}  # doc id -> number of terms
+        self.total_length = 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        """
+        Index a document
+
+        Args:
+            doc_id: ID of the document
+            text: Document text
+        """
+        terms = tokenize(text)
+        for term in terms:
+            docs = self.postings.setdefault(term, {})
+            docs[doc_id] = docs.get(doc_id, 0) + 1
+        self.lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """
+        Find the documents most relevant to a query
+
+        Args:
+            query: Query text
+            limit: Maximum number of results
+
+        Returns:
+            Matching doc IDs, best first
+        """
+        if not self.lengths:
+            return []
+        count = len(self.lengths)
+        average_length = self.total_length / count
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+class MemoryStore:
+    """
+    Bounded conversation memory for the AI
+
+    The transcript file stays append-only, but it is parsed once; the most
+    recent exchanges are sent verbatim and older ones are only reachable
+    through a BM25 index, so each prompt carries a fixed-size slice of memory.
+    With a summarizer, older exchanges are also folded in the background into
+    a rolling summary kept next to the transcript.
+    """
+
+    def __init__(self,
+                 path: str = "memory.peepee_poopoo",
+                 recent_turns: int = RECENT_TURNS,
+                 top_k: int = TOP_K,
+                 token_budget: int = TOKEN_BUDGET,
+                 summarizer: Optional[Summarizer] = None,
+                 summary_batch: int = SUMMARY_BATCH):
+        """
+        Load a memory transcript
+
+        Args:
+            path: Path of the transcript file
+            recent_turns: Number of latest exchanges always included
+            top_k: Maximum number of older exchanges retrieved per query
+            token_budget: Approximate token limit of the built context
+            summarizer: Optional function folding old exchanges into the summary
+            summary_batch: Unsummarized older exchanges that trigger a compaction
+        """
+        self.path = path
+        self.recent_turns = recent_turns
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.turns: List[Tuple[str, str]] = []
+        self.index = BM25Index()
+        self._indexed = 0  # turns[:_indexed] are searchable
+        self._lock = threading.Lock()
+
+        self.summarizer = summarizer
+        self.summary_batch = summary_batch
+        self.summary_path = path + ".summary"
+        self.summary = ""
+        self._summarized = 0  # turns[:_summarized] are covered by the summary
+        self._compaction_lock = threading.Lock()
+        self._compaction_requested = threading.Event()
+        self._closed = False
+        if summarizer:
+            try:
+                with open(self.summary_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.summary, self._summarized = data["summary"], data["turns"]
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = f.read()
+        except FileNotFoundError:
+            transcript = ""
+        for user_message, reply in parse_turns(transcript):
+            self._append_turn(user_message, reply)
+
+        if summarizer:
+            self._compactor = threading.Thread(target=self._compaction_loop, daemon=True)
+            self._compactor.start()
+
+    def _append_turn(self, user_message: str, reply: str) -> None:
+        """Add an exchange in memory, indexing whatever left the recent window"""
+        self.turns.append((user_message, reply))
+        while self._indexed < len(self.turns) - self.recent_turns:
+            self.index.add(self._indexed, format_turn(*self.turns[self._indexed]))
+            self._indexed += 1
+        if self.summarizer and self._indexed - self._summarized >= self.summary_batch:
+            self._compaction_requested.set()
+
+    def add_turn(self, user_message: str, reply: str) -> None:
+        """
+        Remember an exchange and append it to the transcript file
+
+        Args:
+            user_message: What the user said
+            reply: What the AI answered
+        """
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(format_turn(user_message, reply))
+            self._append_turn(user_message, reply)
+
+    def build_context(self, query: str) -> str:
+        """
+        Build the memory text to send with a message
+
+        The rolling summary is taken first, then the newest exchanges, then
+        the older exchanges most relevant to the query, stopping at the token
+        budget.
+
+        Args:
+            query: The message about to be sent
+
+        Returns:
+            Memory text in chronological order
+        """
+        with self._lock:
+            budget = self.token_budget
+            summary = ""
+            if self.summary and estimate_tokens(self.summary) <= budget:
+                summary = "Summary of earlier conversations:\n" + self.summary + "\n"
+                budget -= estimate_tokens(summary)
+
+            recent: List[str] = []
+            for position in range(len(self.turns) - 1, self._indexed - 1, -1):
+                text = format_turn(*self.turns[position])
+                cost = estimate_tokens(text)
+                if cost > budget:
+                    break
+                recent.append(text)
+                budget -= cost
+
+            retrieved: List[Tuple[int, str]] = []
+            for doc_id in self.index.search(query, self.top_k):
+                text = format_turn(*self.turns[doc_id])
+                cost = estimate_tokens(text)
+                if cost <= budget:
+                    retrieved.append((doc_id, text))
+                    budget -= cost
+
+        return summary + "".join(text for _, text in sorted(retrieved)) + "".join(reversed(recent))
+
+    def digest(self) -> str:
+        """
+        Get a digest of the long-term memory (the rolling summary)
+
+        It only changes when the summary does, so it suits cache keys for
+        answers that should not outlive what the AI knows about the user.
+
+        Returns:
+            Hex digest
+        """
+        with self._lock:
+            return hashlib.sha256(self.summary.encode("utf-8")).hexdigest()
+
+    def compact(self) -> None:
+        """Fold the older exchanges not yet summarized into the rolling summary"""
+        with self._compaction_lock:
+            with self._lock:
+                summary, start, end = self.summary, self._summarized, self._indexed
+                turns = self.turns[start:end]
+            if not turns:
+                return
+
+            # The summarizer may be slow (a model call); sends keep going meanwhile
+            summary = self.summarizer(summary, turns)
+
+            temp_path = self.summary_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"summary": summary, "turns": end}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.summary_path)
+
+            with self._lock:
+                self.summary, self._summarized = summary, end
+
+    def _compaction_loop(self) -> None:
+        """Background loop summarizing old exchanges whenever enough pile up"""
+        while True:
+            self._compaction_requested.wait()
+            self._compaction_requested.clear()
+            if self._closed:
+                return
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Memory summarization failed: {e}")
+
+    def close(self) -> None:
+        """Stop the background summarizer"""
+        self._closed = True
+        self._compaction_requested.set()
@@ -0,0 +1,191 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+FIRST_TOKEN_LATENCY = 0.3  # seconds before the first token
+TOKEN_INTERVAL = 0.02  # seconds between tokens
+REPLY_TOKENS = 40
+RATE_LIMIT_PROBABILITY = 0.0  # share of requests answered with 429
+RETRY_AFTER = 0.5  # seconds sent in the Retry-After header of a 429
+
+class FakeChatServer:
+    """
+    Local stand-in for an OpenAI-compatible chat-completions endpoint
+
+    Emulates provider latency (time to first token plus a per-token rate),
+    server-sent-event streaming and random 429 rate-limit responses, so the
+    AI client can be load-tested without touching the real API.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 first_token_latency: float = FIRST_TOKEN_LATENCY,
+                 token_interval: float = TOKEN_INTERVAL,
+                 reply_tokens: int = REPLY_TOKENS,
+                 rate_limit_probability: float = RATE_LIMIT_PROBABILITY,
+                 retry_after: float = RETRY_AFTER):
+        """
+        Initialize the server (call start() to serve)
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            first_token_latency: Seconds before the first token
+            token_interval: Seconds between tokens
+            reply_tokens: Number of tokens in every reply
+            rate_limit_probability: Share of requests rejected with 429
+            retry_after: Retry-After seconds of rejected requests
+        """
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.reply_tokens = reply_tokens
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        server = self
+
+        class Handler(ChatCompletionsHandler):
+            fake = server
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """URL to configure as an OpenAI-compatible base URL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeChatServer":
+        """
+        Serve requests on a background thread
+
+        Returns:
+            The server itself
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def admit(self) -> bool:
+        """
+        Count a request and decide whether it is rate limited
+
+        Returns:
+            True if the request should be served
+        """
+        with self._lock:
+            self.requests += 1
+            if random.random() < self.rate_limit_probability:
+                self.rate_limited += 1
+                return False
+            return True
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """Request handler serving POST .../chat/completions"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pools are exercised
+    fake: FakeChatServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a complete JSON response"""
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes) -> None:
+        """Write one HTTP chunk of a chunked response"""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        fake = self.fake
+        if not fake.admit():
+            self._send_json(429,
+                            {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                            {"Retry-After": str(fake.retry_after)})
+            return
+
+        completion_id = "chatcmpl-" + uuid.uuid4().hex
+        model = body.get("model", "fake")
+        tokens = [f"token{i} " for i in range(fake.reply_tokens)]
+        time.sleep(fake.first_token_latency)
+
+        if not body.get("stream"):
+            time.sleep(fake.token_interval * (len(tokens) - 1))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0,
+                             "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}]
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(fake.token_interval)
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            }
+            self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat-completions server")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=FIRST_TOKEN_LATENCY, help="seconds to first token")
+    parser.add_argument("--token-interval", type=float, default=TOKEN_INTERVAL)
+    parser.add_argument("--reply-tokens", type=int, default=REPLY_TOKENS)
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT_PROBABILITY, help="share of 429 responses")
+    args = parser.parse_args()
+
+    server = FakeChatServer(port=args.port,
+                            first_token_latency=args.latency,
+                            token_interval=args.token_interval,
+                            reply_tokens=args.reply_tokens,
+                            rate_limit_probability=args.rate_limit)
+    print(f"Serving fake chat completions at {server.base_url}")
+    server.httpd.serve_forever()
+
+if __name__ == "__main__":
+    main()
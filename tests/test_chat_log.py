@@ -0,0 +1,83 @@
+import os
+import time
+import chat_log
+from chat_log import ChatLog
+
+def write_log(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+def test_truncated_last_record_is_dropped(tmp_path):
+    path = str(tmp_path / "chat.log")
+    write_log(path, ['{"seq": 1, "op": "a"}\n', '{"seq": 2, "op": "b"}\n', '{"seq": 3, "op": "c"'])
+    assert [record["seq"] for record in ChatLog.read_records(path)] == [1, 2]
+
+    log = ChatLog(path)
+    assert log.seq == 2
+    assert log.append({"op": "d"}) == 3
+    log.close()
+    assert [record["op"] for record in ChatLog.read_records(path)] == ["a", "b", "d"]
+
+def test_torn_record_and_everything_after_it_are_dropped(tmp_path):
+    path = str(tmp_path / "chat.log")
+    write_log(path, ['{"seq": 1, "op": "a"}\n', '{"seq": 2, "o\x00\x00\n', '{"seq": 3, "op": "c"}\n'])
+    assert [record["seq"] for record in ChatLog.read_records(path)] == [1]
+
+    log = ChatLog(path)
+    log.close()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == '{"seq": 1, "op": "a"}\n'
+
+def test_records_after_a_snapshot_seq_are_replayed(tmp_path):
+    path = str(tmp_path / "chat.log")
+    log = ChatLog(path, start_seq=10)
+    log.append({"op": "a"})
+    log.append({"op": "b"})
+    log.close()
+    assert [record["seq"] for record in ChatLog.read_records(path, after_seq=11)] == [12]
+
+def count_fsyncs(monkeypatch):
+    calls = []
+    fsync = os.fsync
+    def counting_fsync(fd):
+        calls.append(fd)
+        fsync(fd)
+    monkeypatch.setattr(chat_log.os, "fsync", counting_fsync)
+    return calls
+
+def test_full_batch_is_committed_at_once(tmp_path, monkeypatch):
+    calls = count_fsyncs(monkeypatch)
+    path = str(tmp_path / "chat.log")
+    log = ChatLog(path, batch_size=3, sync_interval=60)
+    log.append({"op": "a"})
+    log.append({"op": "b"})
+    assert calls == []
+    log.append({"op": "c"})
+    assert len(calls) == 1  # one fsync for the whole group
+    assert len(list(ChatLog.read_records(path))) == 3
+    log.close()
+
+def test_partial_batch_is_committed_after_the_sync_interval(tmp_path, monkeypatch):
+    calls = count_fsyncs(monkeypatch)
+    path = str(tmp_path / "chat.log")
+    log = ChatLog(path, batch_size=100, sync_interval=0.01)
+    log.append({"op": "a"})
+    log.append({"op": "b"})
+    deadline = time.monotonic() + 5
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 1
+    assert len(list(ChatLog.read_records(path))) == 2
+    log.close()
+
+def test_flush_commits_pending_records(tmp_path, monkeypatch):
+    calls = count_fsyncs(monkeypatch)
+    path = str(tmp_path / "chat.log")
+    log = ChatLog(path, batch_size=100, sync_interval=60)
+    log.append({"op": "a"})
+    log.flush()
+    assert len(calls) == 1
+    assert len(list(ChatLog.read_records(path))) == 1
+    log.flush()
+    assert len(calls) == 1  # nothing pending, nothing to sync
+    log.close()
@@ -0,0 +1,65 @@
+from datetime import datetime
+from message import DirectMessage, RoomMessage
+
+STORED_ROOM_MESSAGE = {
+    "message_id": "m1",
+    "sender_id": "u1",
+    "sender_name": "John Smith",
+    "content": "hello",
+    "type": "text",
+    "media_url": None,
+    "timestamp": "2024-01-01T12:00:00",
+    "reply_to": None,
+    "edited": False,
+    "reactions": {}
+}
+
+def test_room_message_reads_like_a_dict():
+    message = RoomMessage.from_dict(STORED_ROOM_MESSAGE)
+    assert message["content"] == "hello"
+    assert message["timestamp"] == datetime(2024, 1, 1, 12, 0)
+    assert message.get("reply_to") is None
+    assert message.get("edited_by") is None  # optional keys are absent until set
+    assert message.get("unknown", "default") == "default"
+    assert "edited_at" not in message
+    assert set(message) == set(STORED_ROOM_MESSAGE)
+    assert dict(message)["sender_id"] == "u1"
+
+def test_room_message_writes_like_a_dict():
+    message = RoomMessage.from_dict(STORED_ROOM_MESSAGE)
+    message["content"] = "edited"
+    message["edited"] = True
+    message["edited_by"] = "u2"
+    message["edited_at"] = datetime(2024, 1, 2, 8, 30)
+    message["reactions"].setdefault("u2", []).append("👍")
+    assert message["edited_at"] == datetime(2024, 1, 2, 8, 30)
+    assert message.to_dict()["reactions"] == {"u2": ["👍"]}
+    assert len(message) == len(STORED_ROOM_MESSAGE) + 2
+    del message["edited_by"]
+    assert "edited_by" not in message
+
+def test_room_message_round_trip():
+    message = RoomMessage.from_dict(STORED_ROOM_MESSAGE)
+    assert message.to_dict() == STORED_ROOM_MESSAGE
+    message["edited_at"] = datetime(2024, 1, 2, 8, 30)
+    data = message.to_dict()
+    assert data["edited_at"] == "2024-01-02T08:30:00"
+    assert RoomMessage.from_dict(data) == message
+    assert RoomMessage.from_dict(message) is message
+
+def test_direct_message_round_trip():
+    data = {"message_id": "d1", "sender_id": "u1", "sender_name": "John Smith", "content": "hi",
+            "type": "text", "media_url": None, "timestamp": "2024-01-01T12:00:00", "read": False}
+    message = DirectMessage.from_dict(data)
+    assert message["read"] is False
+    message["read"] = True
+    assert message.to_dict() == dict(data, read=True)
+
+def test_unknown_keys_are_rejected():
+    message = RoomMessage.from_dict(STORED_ROOM_MESSAGE)
+    try:
+        message["not_a_field"] = 1
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("unknown key was accepted")
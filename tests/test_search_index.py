@@ -0,0 +1,65 @@
+from events import room_topic, dm_topic
+from search_index import SearchIndex, normalize_text, parse_query
+
+ROOM = room_topic("r1")
+OTHER_ROOM = room_topic("r2")
+
+def make_index(*contents, scope=ROOM):
+    index = SearchIndex()
+    for i, content in enumerate(contents):
+        index.add(scope, {"message_id": f"m{i}", "content": content})
+    return index
+
+def found(index, query, scopes=frozenset({ROOM})):
+    return [message["message_id"] for _, message, _ in index.search(query, set(scopes))]
+
+def test_ranking_prefers_frequent_terms_in_short_messages():
+    index = make_index("the shelter opens at noon and the shelter has water and food for everyone tonight",
+                       "shelter shelter",
+                       "water only")
+    assert found(index, "shelter ") == ["m1", "m0"]
+
+def test_ranking_weighs_rare_terms_higher():
+    # Same length and matches; m0 repeats the rare term, m1 the common one
+    index = make_index("medic medic needed", "medic needed needed", "needed", "needed now", "needed here")
+    assert found(index, "medic needed ") == ["m0", "m1"]
+
+def test_hebrew_niqqud_and_final_letters_are_normalized():
+    assert normalize_text("שָׁלוֹם") == normalize_text("שלומ")
+    index = make_index("שָׁלוֹם לכולם", "מלך", "מלכה")
+    assert found(index, "שלום ") == ["m0"]
+    assert found(index, "מלך ") == ["m1"]
+    assert set(found(index, "מלכ")) == {"m1", "m2"}  # unfinished last word
+
+def test_prefix_queries():
+    assert parse_query("hel") == [("hel", True)]
+    assert parse_query("hel ") == [("hel", False)]
+    assert parse_query("hel* world ") == [("hel", True), ("world", False)]
+    index = make_index("hello world", "help wanted", "shell")
+    assert set(found(index, "hel")) == {"m0", "m1"}
+    assert found(index, "hel ") == []
+    assert found(index, "hel* world ") == ["m0"]
+
+def test_exact_matches_outrank_prefix_completions():
+    index = make_index("help", "helpful")
+    assert found(index, "help") == ["m0", "m1"]
+
+def test_search_is_limited_to_the_given_scopes():
+    index = make_index("shelter in room one")
+    index.add(OTHER_ROOM, {"message_id": "m1", "content": "shelter in room two"})
+    index.add(dm_topic("a", "b"), {"message_id": "m2", "content": "shelter by DM"})
+    assert found(index, "shelter ") == ["m0"]
+    assert set(found(index, "shelter ", {ROOM, dm_topic("b", "a")})) == {"m0", "m2"}
+    assert found(index, "shelter ", set()) == []
+
+def test_edits_and_deletions_update_the_index():
+    index = make_index("old text")
+    index.handle_event({"op": "edit_message", "room_id": "r1", "message_id": "m0", "content": "new text"})
+    assert found(index, "old ") == []
+    assert found(index, "new ") == ["m0"]
+
+    index.handle_event({"op": "add_message", "room_id": "r1", "message": {"message_id": "m1", "content": "new again"}})
+    index.handle_event({"op": "delete_message", "room_id": "r1", "message_id": "m0"})
+    assert found(index, "new ") == ["m1"]
+    assert found(index, "tex") == []  # dropped terms leave the prefix vocabulary too
+    assert len(index) == 1
@@ -0,0 +1,43 @@
+from slow_mode import SlowModeLimiter, SWEEP_INTERVAL
+from chat_manager import ChatRoom
+from user import User, UserType
+
+def make_limiter():
+    now = [0.0]
+    return SlowModeLimiter(clock=lambda: now[0]), now
+
+def test_one_message_per_interval():
+    limiter, now = make_limiter()
+    assert limiter.allow("a", 5)
+    assert not limiter.allow("a", 5)
+    assert limiter.allow("b", 5)
+    now[0] = 3
+    assert limiter.retry_after("a", 5) == 2.0
+    now[0] = 5
+    assert limiter.allow("a", 5)
+
+def test_non_positive_interval_means_no_limit():
+    limiter, _ = make_limiter()
+    assert all(limiter.allow("a", 0) for _ in range(3))
+    assert limiter.allow("a", -1)
+    assert limiter.retry_after("a", 0) == 0.0
+
+def test_idle_buckets_are_swept():
+    limiter, now = make_limiter()
+    for i in range(100):
+        limiter.allow(f"user{i}", 5)
+    now[0] = SWEEP_INTERVAL
+    limiter.allow("active", 5)
+    assert len(limiter) == 1
+
+def test_room_rejects_invalid_intervals():
+    room = ChatRoom("r1", "Room", "soldier", User("u1", "A", "A", UserType.SOLDIER))
+    for interval in (0, -1, "5", None, True, float("nan")):
+        try:
+            room.update_settings({"slow_mode_interval": interval})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{interval!r} was accepted")
+    room.update_settings({"slow_mode_interval": 2.5})
+    assert room.settings["slow_mode_interval"] == 2.5
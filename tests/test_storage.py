@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from chat_manager import ChatManager
+from message import DirectMessage
+from storage import JsonStorage, SQLiteStorage, conversation_key
+from user import User, UserType
+
+ROOM = {
+    "room_id": "r1",
+    "name": "Room",
+    "room_type": "soldier",
+    "created_by": "u1",
+    "messages": [],
+    "participants": ["u1"],
+    "moderators": ["u1"],
+    "pinned_messages": [],
+    "settings": {}
+}
+
+def message(message_id, content):
+    return {"message_id": message_id, "sender_id": "u1", "content": content, "reactions": {}}
+
+def open_storage(data_dir):
+    # No background compactions during a test
+    storage = JsonStorage(str(data_dir), compaction_threshold=10 ** 6, compaction_interval=10 ** 6)
+    return storage, storage.load_state()
+
+def test_histories_are_stored_per_room(tmp_path):
+    storage, _ = open_storage(tmp_path)
+    storage.append({"op": "create_room", "room": ROOM})
+    storage.append({"op": "add_message", "room_id": "r1", "message": message("m1", "first")})
+    storage.compact()
+    storage.append({"op": "add_message", "room_id": "r1", "message": message("m2", "second")})
+    storage.close()
+
+    with open(tmp_path / "snapshot.json", encoding="utf-8") as f:
+        assert "messages" not in json.load(f)["rooms"]["r1"]
+    assert os.listdir(tmp_path / "rooms") == ["r1.json"]
+
+    storage, state = open_storage(tmp_path)
+    assert "messages" not in state["rooms"]["r1"]
+    assert [m["content"] for m in storage.load_room_messages("r1")] == ["first", "second"]
+    storage.close()
+
+def test_legacy_snapshot_is_split(tmp_path):
+    room = dict(ROOM, messages=[message("m1", "first")])
+    with open(tmp_path / "snapshot.json", "w", encoding="utf-8") as f:
+        json.dump({"seq": 0, "rooms": {"r1": room}, "user_rooms": {}, "conversations": {}, "user_conversations": {}}, f)
+
+    storage, state = open_storage(tmp_path)
+    assert "messages" not in state["rooms"]["r1"]
+    assert [m["content"] for m in storage.load_room_messages("r1")] == ["first"]
+    storage.close()
+
+def test_history_ahead_of_snapshot_is_not_replayed_twice(tmp_path):
+    storage, _ = open_storage(tmp_path)
+    storage.append({"op": "create_room", "room": ROOM})
+    storage.compact()
+    storage.append({"op": "add_message", "room_id": "r1", "message": message("m1", "first")})
+    storage.close()
+
+    # A compaction interrupted between writing the history and the snapshot
+    with open(tmp_path / "rooms" / "r1.json", "w", encoding="utf-8") as f:
+        json.dump({"seq": 2, "messages": [message("m1", "first")]}, f)
+
+    storage, _ = open_storage(tmp_path)
+    assert [m["content"] for m in storage.load_room_messages("r1")] == ["first"]
+    storage.compact()
+    storage.close()
+
+    storage, _ = open_storage(tmp_path)
+    assert [m["content"] for m in storage.load_room_messages("r1")] == ["first"]
+    storage.close()
+
+def test_replayed_records_count_toward_compaction(tmp_path):
+    storage, _ = open_storage(tmp_path)
+    for _ in range(3):
+        storage.append({"op": "join_room", "room_id": "r1", "user_id": "u2"})
+    storage.close()
+
+    storage = JsonStorage(str(tmp_path), compaction_threshold=3, compaction_interval=10 ** 6)
+    storage.load_state()
+    storage.close()
+    with open(tmp_path / "snapshot.json", encoding="utf-8") as f:
+        assert json.load(f)["seq"] == 3
+
+def test_failed_compaction_is_retried(tmp_path):
+    storage, _ = open_storage(tmp_path)
+    compact, failed, retried = storage.compact, threading.Event(), threading.Event()
+    def flaky_compact():
+        if not failed.is_set():
+            failed.set()
+            raise OSError("disk full")
+        compact()
+        retried.set()
+    storage.compact = flaky_compact
+    storage.compaction_threshold = 1
+    storage.append({"op": "join_room", "room_id": "r1", "user_id": "u2"})
+    assert failed.wait(5)
+    storage.append({"op": "join_room", "room_id": "r1", "user_id": "u3"})
+    assert retried.wait(5)
+    storage.close()
+
+def direct_message(message_id, sender_id, read=False):
+    return {"message_id": message_id, "sender_id": sender_id, "sender_name": sender_id,
+            "content": message_id, "timestamp": "2024-01-01T12:00:00", "read": read}
+
+def test_legacy_direct_messages_are_merged_into_conversations(tmp_path):
+    # Every message was stored once per participant; only the reader's copy got read flags
+    reader_copy = [direct_message("m1", "a", read=True), direct_message("m2", "a", read=True),
+                   direct_message("m3", "a"), direct_message("m4", "b")]
+    sender_copy = [direct_message("m1", "a"), direct_message("m2", "a"),
+                   direct_message("m3", "a"), direct_message("m4", "b")]
+    with open(tmp_path / "snapshot.json", "w", encoding="utf-8") as f:
+        json.dump({"seq": 0, "rooms": {}, "user_rooms": {},
+                   "direct_messages": {"a": {"b": sender_copy}, "b": {"a": reader_copy}},
+                   "read_positions": {"b": {"a": 2}}}, f)
+
+    for _ in range(2):  # as migrated, then after the migrated state was compacted and reloaded
+        manager = ChatManager(JsonStorage(str(tmp_path)))
+        assert list(manager.conversations) == [conversation_key("a", "b")]
+        assert [m["message_id"] for m in manager.conversations[conversation_key("b", "a")]] == ["m1", "m2", "m3", "m4"]
+        assert manager.user_conversations == {"a": {"b": "a|b"}, "b": {"a": "a|b"}}
+        assert manager.unread_counts == {"a": {"b": 1}, "b": {"a": 1}}
+        manager.save_data()
+        manager.close()
+
+def test_direct_messages_are_paged_by_id(tmp_path):
+    a, b = User("a", "A", "A", UserType.SOLDIER), User("b", "B", "B", UserType.SOLDIER)
+    manager = ChatManager(JsonStorage(str(tmp_path)))
+    sent = [manager.send_direct_message(a, b, str(i)) for i in range(5)]
+    manager.close()
+
+    manager = ChatManager(JsonStorage(str(tmp_path)))  # the index is rebuilt on load
+    sent.append(manager.send_direct_message(b, a, "5"))
+    page = lambda **kwargs: [m["message_id"] for m in manager.get_direct_messages(a, b, **kwargs)]
+    assert page(before=sent[4], limit=2) == sent[2:4]
+    assert page(after=sent[1], limit=3) == sent[2:5]
+    assert page(before=sent[5]) == sent[:5]
+    assert page(before="missing") == []
+    manager.close()
+
+def test_sqlite_read_watermark_matches_json(tmp_path):
+    a, b = User("a", "A", "A", UserType.SOLDIER), User("b", "B", "B", UserType.SOLDIER)
+    for open_backend in (lambda: JsonStorage(str(tmp_path / "json")),
+                         lambda: SQLiteStorage(str(tmp_path / "chat.db"))):
+        manager = ChatManager(open_backend())
+        manager.send_direct_message(a, b, "1")
+        manager.send_direct_message(a, b, "2")
+        manager.mark_messages_read(b, a)
+        manager.storage.append({"op": "send_direct_message", "sender_id": "a", "recipient_id": "b",
+                                "message": DirectMessage.from_dict(direct_message("late", "a"))})
+        # A replayed read of the first message only must not cover later messages
+        manager.storage.append({"op": "mark_messages_read", "user_id": "b", "other_user_id": "a", "position": 1})
+        manager.close()
+
+        manager = ChatManager(open_backend())
+        assert manager.read_positions == {"b": {"a": 2}}
+        assert [m["read"] for m in manager.conversations[conversation_key("a", "b")]] == [True, True, False]
+        assert manager.get_unread_counts(b) == {"a": 1}
+        manager.close()
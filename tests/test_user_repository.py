@@ -0,0 +1,39 @@
+from datetime import datetime
+from chat_manager import ChatManager
+from storage import JsonStorage
+from soldier import Soldier
+from user import CombatRole
+
+def login(data_dir):
+    # A fresh object per session, built from users.json as the welcome screen does
+    manager = ChatManager(JsonStorage(str(data_dir)))
+    soldier = Soldier("s1", "John", "Smith", CombatRole.MEDIC, "101st Division")
+    manager.add_user(soldier)
+    return manager, soldier
+
+def test_changes_after_a_restart_are_saved(tmp_path):
+    manager, soldier = login(tmp_path)
+    soldier.add_deployment("North", datetime(2024, 1, 1))
+    manager.close()
+
+    manager, soldier = login(tmp_path)
+    assert manager.users.get("s1") is soldier
+    assert len(soldier.deployments) == 1  # stored records win over the login object's
+    soldier.add_deployment("South", datetime(2024, 6, 1))
+    soldier.update_profile(phone="050-0000000")
+    manager.close()
+
+    manager, _ = login(tmp_path)
+    stored = manager.users.storage.load_user("s1")
+    assert [deployment["location"] for deployment in stored["deployments"]] == ["North", "South"]
+    assert stored["phone"] == "050-0000000"
+    manager.close()
+
+def test_reading_a_user_does_not_mark_it_dirty(tmp_path):
+    manager, _ = login(tmp_path)
+    manager.close()
+
+    manager, soldier = login(tmp_path)
+    assert soldier.deployments == []
+    assert not manager.users._dirty
+    manager.close()
@@ -0,0 +1,31 @@
+from word_filter import MutedWordFilter
+
+def test_whole_words_are_censored():
+    muted = MutedWordFilter(["ass"])
+    assert muted.censor("kick ass!") == "kick ***!"
+    assert muted.censor("ASS") == "***"
+
+def test_embedded_words_are_left_alone():
+    muted = MutedWordFilter(["ass", "שם"])
+    assert muted.censor("I passed the class assignment") == "I passed the class assignment"
+    assert muted.censor("השמש") == "השמש"
+
+def test_hebrew_with_niqqud_and_final_letters():
+    muted = MutedWordFilter(["שם"])
+    # Niqqud is masked together with its letter; the final mem matches the regular one
+    assert muted.censor("שָׁם הוא") == "**** הוא"
+    assert muted.censor("שׁם, כן") == "***, כן"
+
+def test_overlapping_words_are_merged():
+    muted = MutedWordFilter(["good bad", "bad word", "word"])
+    assert muted.find("so good bad word here") == [(3, 16)]
+    assert muted.censor("a word") == "a ****"
+
+def test_shorter_word_matches_when_longer_one_is_embedded():
+    muted = MutedWordFilter(["ab", "b"])
+    assert muted.censor("xab b") == "xab *"
+
+def test_empty_word_list():
+    muted = MutedWordFilter(["", "  "])
+    assert not muted
+    assert muted.censor("anything") == "anything"